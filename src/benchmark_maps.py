@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Measure how the cost of a game action grows with the size of the map."""
+
+import argparse
+import time
+
+from risk_ai_game import AggressiveAgent, PlanningAgent, RandomAgent, RiskAIGameOptions, run_game
+from risk_ai_game.maps import generate_map
+from risk_ai_game.telemetry import TurnCountCollector
+
+
+# Counts actions, so the time per action can be reported.
+class ActionCounter(TurnCountCollector):
+    def __init__(self) -> None:
+        super().__init__()
+        self.actions = 0
+
+    def on_action(self, game_state, action, result) -> None:
+        self.actions += 1
+
+
+def bench(game_map, games, max_turns, agent_class=AggressiveAgent):
+    actions = 0
+    start = time.perf_counter()
+    for seed in range(games):
+        counter = ActionCounter()
+        run_game(RiskAIGameOptions(
+            agents=[agent_class(0), RandomAgent(1, aggression=0.7)],
+            max_turns=max_turns,
+            verbose=False,
+            random_seed=seed,
+            game_map=game_map,
+            game_telemetry=counter,
+        ))
+        actions += counter.actions
+    return actions, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[42, 250, 1000, 4000])
+    parser.add_argument("--games", type=int, default=3)
+    parser.add_argument("--max-turns", type=int, default=40)
+    parser.add_argument("--planning", action="store_true",
+                        help="play PlanningAgent (one plan per turn) instead of AggressiveAgent")
+    args = parser.parse_args()
+    agent_class = PlanningAgent if args.planning else AggressiveAgent
+
+    print(f"{'territories':>12} {'edges':>8} {'actions':>8} {'us/action':>10}")
+    for size in args.sizes:
+        game_map = generate_map(size, num_continents=max(2, size // 40), seed=size)
+        actions, seconds = bench(game_map, args.games, args.max_turns, agent_class)
+        print(f"{size:>12} {game_map.num_edges // 2:>8} {actions:>8} {1e6 * seconds / actions:>10.1f}")
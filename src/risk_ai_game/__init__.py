@@ -1,11 +1,20 @@
 # re-export classes to allow client code to access them easily.
 
+__version__ = "0.1.0"
+
 from risk_ai_game.action import Phase, DeployAction, AttackAction, FortifyAction, EndPhaseAction
-from risk_ai_game.agent import Agent, RandomAgent, AggressiveAgent
+from risk_ai_game.agent import Agent, AgentSpec, RandomAgent, AggressiveAgent, PlanningAgent, ExpectiminimaxAgent
+from risk_ai_game.analysis import PlayerAnalysis
 from risk_ai_game.board import Board
+from risk_ai_game.evaluation import LinearEvaluator, MLPEvaluator, extract_features, load_evaluator
+from risk_ai_game.experiments import ExperimentCache, ExperimentResults
 from risk_ai_game.game_state import GameState, CONTINENT_BONUSES
+from risk_ai_game.maps import GameMap, generate_map, load_map, save_map
+from risk_ai_game.results import ResultsStore, run_batch
 from risk_ai_game.render import render_state, render_state_from_game_state, game_state_to_render_dict
 from risk_ai_game.options import RiskAIGameOptions
+from risk_ai_game.plan import AttackOrder, TurnPlan
 from risk_ai_game.run import run_game
-from risk_ai_game.telemetry import GameInitialFinalStates, GameTelemetry, TerritoryCountCollector, TurnCountCollector
+from risk_ai_game.stats import StreamingStatsCollector
+from risk_ai_game.telemetry import GameInitialFinalStates, GameTelemetry, MultiTelemetry, TerritoryCountCollector, TurnCountCollector
 from risk_ai_game.territory import Territory
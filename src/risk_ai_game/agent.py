@@ -1,8 +1,13 @@
 """Agent classes for the Risk game."""
 
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+import importlib
+import math
 import random
 from .action import Phase, DeployAction, AttackAction, FortifyAction, EndPhaseAction
+from .plan import AttackOrder, TurnPlan
+from .search import AttackSearch
 
 
 class Agent(ABC):
@@ -14,10 +19,44 @@ class Agent(ABC):
     def choose_action(self, game_state):
         pass
 
+    def plan_turn(self, game_state):
+        """Optionally plan the whole turn at once, see plan.TurnPlan.
+
+        Called at the start of each of this agent's turns. Returning a plan
+        lets the engine play the turn without asking choose_action for every
+        single action, which is much cheaper. Return None (the default) to be
+        asked for one action at a time.
+        """
+        return None
+
     def __repr__(self):
         return self.name
 
 
+# An agent class and its constructor parameters, without a player id yet.
+# Lets agents be described up front and built per game, e.g. in other processes.
+@dataclass
+class AgentSpec:
+    agent_class: type
+    params: dict = field(default_factory=dict)
+
+    def build(self, player_id, name=None):
+        return self.agent_class(player_id, name=name, **self.params)
+
+    def to_dict(self):
+        """JSON friendly form, the class as a "module:QualName" import path."""
+        cls = self.agent_class
+        return {"class": f"{cls.__module__}:{cls.__qualname__}", "params": self.params}
+
+    @classmethod
+    def from_dict(cls, data):
+        module_name, _, qualname = data["class"].partition(":")
+        obj = importlib.import_module(module_name)
+        for part in qualname.split("."):
+            obj = getattr(obj, part)
+        return cls(obj, dict(data.get("params", {})))
+
+
 class RandomAgent(Agent):
     """Makes random decisions. Baseline agent for testing."""
 
@@ -34,19 +73,12 @@ class RandomAgent(Agent):
             return self._choose_fortify(game_state)
 
     def _choose_deploy(self, game_state):
-        territories = game_state.get_player_territories(self.player_id)
+        territories = game_state.analysis(self.player_id).territories
         target = random.choice(territories)
         return DeployAction(target.name, game_state.armies_to_deploy)
 
     def _choose_attack(self, game_state):
-        attackable = []
-        for t in game_state.get_player_territories(self.player_id):
-            if t.armies < 2:
-                continue
-            for neighbor_name in t.neighbors:
-                neighbor = game_state.board.get(neighbor_name)
-                if neighbor and neighbor.owner != self.player_id:
-                    attackable.append((t, neighbor))
+        attackable = game_state.analysis(self.player_id).attackable
 
         if not attackable or random.random() > self.aggression:
             return EndPhaseAction()
@@ -60,10 +92,14 @@ class RandomAgent(Agent):
 
 
 class AggressiveAgent(Agent):
-    """Always attacks when possible, focuses forces on the front."""
+    """Always attacks when possible, focuses forces on the front.
 
-    def __init__(self, player_id, name=None):
+    Only attacks when its armies outnumber the defender's by min_attack_ratio.
+    """
+
+    def __init__(self, player_id, min_attack_ratio=1.5, name=None):
         super().__init__(player_id, name)
+        self.min_attack_ratio = min_attack_ratio
 
     def choose_action(self, game_state):
         if game_state.phase == Phase.DEPLOY:
@@ -75,11 +111,9 @@ class AggressiveAgent(Agent):
 
     def _choose_deploy(self, game_state):
         # put all armies on territory with most enemy neighbors
-        territories = game_state.get_player_territories(self.player_id)
-        best = max(territories, key=lambda t: sum(
-            1 for n in t.neighbors
-            if game_state.board.get(n) and game_state.board.get(n).owner != self.player_id
-        ))
+        analysis = game_state.analysis(self.player_id)
+        counts = analysis.enemy_neighbor_counts
+        best = max(analysis.territories, key=lambda t: counts[t.name])
         return DeployAction(best.name, game_state.armies_to_deploy)
 
     def _choose_attack(self, game_state):
@@ -87,19 +121,14 @@ class AggressiveAgent(Agent):
         best_attack = None
         best_ratio = 0
 
-        for t in game_state.get_player_territories(self.player_id):
-            if t.armies < 2:
-                continue
-            for neighbor_name in t.neighbors:
-                neighbor = game_state.board.get(neighbor_name)
-                if neighbor and neighbor.owner != self.player_id:
-                    ratio = t.armies / max(1, neighbor.armies)
-                    if ratio > best_ratio:
-                        best_ratio = ratio
-                        best_attack = (t, neighbor)
+        for t, neighbor in game_state.analysis(self.player_id).attackable:
+            ratio = t.armies / max(1, neighbor.armies)
+            if ratio > best_ratio:
+                best_ratio = ratio
+                best_attack = (t, neighbor)
 
         # only attack if we have decent odds
-        if best_attack is None or best_ratio < 1.5:
+        if best_attack is None or best_ratio < self.min_attack_ratio:
             return EndPhaseAction()
 
         attacker, defender = best_attack
@@ -108,27 +137,114 @@ class AggressiveAgent(Agent):
 
     def _choose_fortify(self, game_state):
         # move armies from interior to front line
-        territories = game_state.get_player_territories(self.player_id)
+        analysis = game_state.analysis(self.player_id)
 
-        for t in territories:
+        # only interior territories have armies to spare, the rest are on the front line.
+        for t in analysis.interior:
             if t.armies < 2:
                 continue
-            enemy_neighbors = [
-                n for n in t.neighbors
-                if game_state.board.get(n) and game_state.board.get(n).owner != self.player_id
-            ]
-            if enemy_neighbors:
-                continue  # already on front line
 
             # interior territory, try to move armies forward
             for neighbor_name in t.neighbors:
-                neighbor = game_state.board.get(neighbor_name)
-                if neighbor and neighbor.owner == self.player_id:
-                    has_enemies = any(
-                        game_state.board.get(nn) and game_state.board.get(nn).owner != self.player_id
-                        for nn in neighbor.neighbors
-                    )
-                    if has_enemies:
-                        return FortifyAction(t.name, neighbor_name, t.armies - 1)
+                # every neighbor of an interior territory is ours.
+                if analysis.is_border(neighbor_name):
+                    return FortifyAction(t.name, neighbor_name, t.armies - 1)
 
         return EndPhaseAction()
+
+
+class PlanningAgent(AggressiveAgent):
+    """Plays AggressiveAgent's strategy as one plan per turn, see plan.TurnPlan.
+
+    Deploys like AggressiveAgent, then orders attacks from every border
+    territory on each neighbor it outnumbers by min_attack_ratio, best ratio
+    first, each followed by attacks onward from the conquered territory. The
+    plan is made from the board at the start of the turn, so it plays a
+    little differently from AggressiveAgent (about as strong head to head),
+    but the engine asks it once per turn instead of once per action.
+    """
+
+    def plan_turn(self, game_state):
+        analysis = game_state.analysis(self.player_id)
+        deploy = self._choose_deploy(game_state)
+        armies = {t.name: t.armies for t in analysis.territories}
+        armies[deploy.territory] += deploy.armies
+
+        candidates = []
+        for t in analysis.border:
+            for enemy in analysis.enemy_neighbors[t.name]:
+                defenders = max(1, enemy.armies)
+                ratio = armies[t.name] / defenders
+                if armies[t.name] >= 2 and ratio >= self.min_attack_ratio:
+                    # stop once the odds against the starting defenders are gone.
+                    needed = max(2, math.ceil(self.min_attack_ratio * defenders))
+                    candidates.append((ratio, AttackOrder(t.name, enemy.name, min_armies=needed)))
+        candidates.sort(key=lambda c: c[0], reverse=True)
+
+        # a conquest moves up to 3 armies in; follow up on weak territories
+        # behind it. Orders whose source was not taken are skipped.
+        attacks = []
+        for _, order in candidates:
+            attacks.append(order)
+            target = game_state.board.get(order.to_territory)
+            for n in target.neighbors:
+                behind = game_state.board.get(n)
+                if behind.owner != self.player_id and 3 >= self.min_attack_ratio * max(1, behind.armies):
+                    attacks.append(AttackOrder(target.name, n))
+
+        fortify = self._choose_fortify(game_state)
+        return TurnPlan(
+            deploy=[deploy],
+            attacks=attacks,
+            fortify=fortify if isinstance(fortify, FortifyAction) else None,
+        )
+
+
+class ExpectiminimaxAgent(AggressiveAgent):
+    """Searches its attacks with expectimax over the exact dice odds.
+
+    Deploys and fortifies like AggressiveAgent. Each attack decision deepens
+    the search until time_limit seconds, node_limit nodes or max_depth
+    attacks ahead, whichever comes first. Leave time_limit as None for
+    searches that are reproducible regardless of machine speed.
+    Statistics for the last search (depth, nodes, nodes_per_second, ...)
+    are kept in last_search. Pass an evaluator from risk_ai_game.evaluation
+    to score search leaves with it instead of the built-in heuristic.
+    """
+
+    def __init__(self, player_id, time_limit=0.05, max_depth=4, node_limit=None,
+                 max_moves=8, evaluator=None, min_attack_ratio=1.5, name=None):
+        super().__init__(player_id, min_attack_ratio, name)
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.node_limit = node_limit
+        self.max_moves = max_moves
+        self.evaluator = evaluator
+        self.last_search = None
+        # transposition table, kept between searches.
+        self._table = {}
+
+    def _choose_attack(self, game_state):
+        search = AttackSearch(
+            game_state,
+            self.player_id,
+            self._table,
+            max_depth=self.max_depth,
+            time_limit=self.time_limit,
+            node_limit=self.node_limit,
+            max_moves=self.max_moves,
+            evaluator=self.evaluator,
+        )
+        move = search.run()
+        self.last_search = search.stats
+
+        if search.stats["depth"] == 0:
+            # not even one attack ahead fit in the budget.
+            return super()._choose_attack(game_state)
+        if move is None:
+            return EndPhaseAction()
+
+        attacker = game_state.board.get(search.names[move[0]])
+        defender = game_state.board.get(search.names[move[1]])
+        num_dice = min(3, attacker.armies - 1)
+        return AttackAction(attacker.name, defender.name, num_dice)
@@ -0,0 +1,131 @@
+"""Per-player strategic analysis of a game state, shared by agents."""
+
+from bisect import bisect_left, insort
+
+from .topology import distances_from
+
+
+# Helpers for lists of territories kept sorted by key (usually Board.index_of).
+def sorted_insert(items, territory, key):
+    insort(items, territory, key=key)
+
+
+def sorted_remove(items, territory, key):
+    i = bisect_left(items, key(territory), key=key)
+    if i == len(items) or items[i] is not territory:
+        raise ValueError(f"{territory.name} is not in the list")
+    del items[i]
+
+
+# A read-only view of the board from one player's point of view.
+# Built by GameState.analysis(), which caches it until the board changes.
+# Ownership derived facts (borders, interior, enemy neighbor counts) are only
+# updated when a territory changes hands, and then only around the territories
+# that changed; the attackable list also depends on army counts and is rebuilt
+# when any army count changes.
+# Do not mutate the returned lists.
+class PlayerAnalysis:
+    def __init__(self, game_state, player_id):
+        self.player_id = player_id
+        self.ownership_version = -1
+        self.army_version = -1
+        self._enemy_distances = None
+        self._update(game_state)
+
+    def _update(self, game_state):
+        if self.ownership_version != game_state.ownership_version:
+            changes = game_state.ownership_changes_since(self.ownership_version)
+            if changes is None:
+                self._build_ownership(game_state)
+            else:
+                self._apply_changes(game_state, changes)
+            self.ownership_version = game_state.ownership_version
+            self._enemy_distances = None
+            self.army_version = -1
+        if self.army_version != game_state.army_version:
+            self._build_attackable(game_state)
+            self.army_version = game_state.army_version
+
+    def _build_ownership(self, game_state):
+        board = game_state.board
+        player = self.player_id
+
+        # territories in board order, so agents pick the same ones as a plain scan.
+        self.territories = game_state.get_player_territories(player)
+        self.enemy_neighbor_counts = {}
+        # enemy neighbors of each owned territory, in neighbor order.
+        self.enemy_neighbors = {}
+        self.border = []
+        self.interior = []
+        for t in self.territories:
+            enemies = []
+            for n in t.neighbors:
+                neighbor = board.get(n)
+                if neighbor and neighbor.owner != player:
+                    enemies.append(neighbor)
+            self.enemy_neighbors[t.name] = enemies
+            self.enemy_neighbor_counts[t.name] = len(enemies)
+            if enemies:
+                self.border.append(t)
+            else:
+                self.interior.append(t)
+
+    def _apply_changes(self, game_state, changes):
+        board = game_state.board
+        player = self.player_id
+        key = board.index_of
+
+        # only the changed territories and their neighbors can look different.
+        affected = {}
+        for name, _, _ in changes:
+            t = board.get(name)
+            affected[name] = t
+            for n in t.neighbors:
+                affected[n] = board.get(n)
+
+        for name, t in affected.items():
+            count = self.enemy_neighbor_counts.pop(name, None)
+            if count is not None:
+                del self.enemy_neighbors[name]
+                sorted_remove(self.territories, t, key)
+                sorted_remove(self.border if count else self.interior, t, key)
+            if t.owner != player:
+                continue
+            enemies = []
+            for n in t.neighbors:
+                neighbor = board.get(n)
+                if neighbor and neighbor.owner != player:
+                    enemies.append(neighbor)
+            self.enemy_neighbors[name] = enemies
+            self.enemy_neighbor_counts[name] = len(enemies)
+            sorted_insert(self.territories, t, key)
+            sorted_insert(self.border if enemies else self.interior, t, key)
+
+    def _build_attackable(self, game_state):
+        # (from, to) territory pairs, from having enough armies to attack.
+        self.attackable = [
+            (t, enemy)
+            for t in self.border
+            if t.armies >= 2
+            for enemy in self.enemy_neighbors[t.name]
+        ]
+
+    def enemy_distances(self, game_state):
+        """Hops from each territory (by map index) to the nearest enemy territory.
+
+        One multi-source BFS, cached until ownership changes.
+        """
+        if self._enemy_distances is None:
+            game_map = game_state.board.map
+            sources = [
+                i for i, t in enumerate(game_state.board.by_index)
+                if t.owner is not None and t.owner != self.player_id
+            ]
+            self._enemy_distances = distances_from(game_map, sources)
+        return self._enemy_distances
+
+    def distance_to_enemy(self, game_state, name):
+        return int(self.enemy_distances(game_state)[game_state.board.map.index[name]])
+
+    def is_border(self, name):
+        return self.enemy_neighbor_counts.get(name, 0) > 0
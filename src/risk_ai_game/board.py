@@ -1,3 +1,7 @@
+from functools import lru_cache
+
+from .maps import GameMap
+from .topology import map_topology
 from .territory import Territory
 
 TERRITORIES = [
@@ -45,14 +49,65 @@ TERRITORIES = [
     ("Eastern Australia", "Australia", ["New Guinea", "Western Australia"]),
 ]
 
+# continent bonuses (from the rulebook)
+CONTINENT_BONUSES = {
+    "North America": 5,
+    "South America": 2,
+    "Europe": 5,
+    "Africa": 3,
+    "Asia": 7,
+    "Australia": 2,
+}
+
+
+@lru_cache(maxsize=None)
+def classic_map():
+    """The standard 42 territory world map."""
+    return GameMap.from_territories(TERRITORIES, CONTINENT_BONUSES, name="classic")
+
+
 class Board:
-    def __init__(self):
+    def __init__(self, game_map=None):
+        self.map = game_map if game_map is not None else classic_map()
+        self.continent_bonuses = self.map.bonuses
         self.territories = {}
-        for name, continent, neighbors in TERRITORIES:
-            self.territories[name] = Territory(name, continent, neighbors)
+        for i, name in enumerate(self.map.names):
+            self.territories[name] = Territory(name, self.map.continents[i], self.map.neighbor_names(i))
+        # territories in map order, so territory i of the map is by_index[i].
+        self.by_index = list(self.territories.values())
+
+    def index_of(self, territory):
+        """Position of territory in the map, for keeping lists in board order."""
+        return self.map.index[territory.name]
 
     def get(self, name):
         return self.territories.get(name)
 
     def all_territories(self):
         return list(self.territories.values())
+
+    # Static graph queries, answered from tables computed once per map.
+
+    @property
+    def topology(self):
+        return map_topology(self.map)
+
+    def distance(self, a, b):
+        """Fewest hops between territories a and b, ignoring ownership."""
+        index = self.map.index
+        return int(self.topology.distances[index[a], index[b]])
+
+    def degree(self, name):
+        return int(self.topology.degrees[self.map.index[name]])
+
+    def is_chokepoint(self, name):
+        """True if removing this territory would split the map."""
+        return self.map.index[name] in self.topology.articulation_points
+
+    def continent_border(self, continent):
+        """Territories of continent that touch another continent."""
+        return [self.map.names[i] for i in self.topology.continent_borders[continent]]
+
+    def continent_entries(self, continent):
+        """Territories outside continent that touch it."""
+        return [self.map.names[i] for i in self.topology.continent_entries[continent]]
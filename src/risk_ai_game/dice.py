@@ -0,0 +1,36 @@
+"""Exact probabilities for the outcome of a single attack roll."""
+
+from functools import lru_cache
+from itertools import product
+
+
+# All outcomes of one roll with attack_dice vs defend_dice dice, resolved the same
+# way as GameState._apply_attack (highest dice pairs compared, ties to the defender).
+# Returns a tuple of (probability, attacker_losses, defender_losses), one per
+# distinct outcome, with the probabilities summing to 1.
+# There are at most 3 outcomes, and only 6 dice combinations are legal, so this
+# is computed once by enumerating every roll and cached.
+@lru_cache(maxsize=None)
+def attack_outcomes(attack_dice, defend_dice):
+    if not 1 <= attack_dice <= 3 or not 1 <= defend_dice <= 2:
+        raise ValueError(f"Invalid dice: {attack_dice} vs {defend_dice}")
+
+    counts = {}
+    for roll in product(range(1, 7), repeat=attack_dice + defend_dice):
+        attack = sorted(roll[:attack_dice], reverse=True)
+        defend = sorted(roll[attack_dice:], reverse=True)
+        attacker_losses = 0
+        defender_losses = 0
+        for a, d in zip(attack, defend):
+            if a > d:
+                defender_losses += 1
+            else:
+                attacker_losses += 1
+        key = (attacker_losses, defender_losses)
+        counts[key] = counts.get(key, 0) + 1
+
+    total = 6 ** (attack_dice + defend_dice)
+    return tuple(
+        (n / total, attacker_losses, defender_losses)
+        for (attacker_losses, defender_losses), n in sorted(counts.items())
+    )
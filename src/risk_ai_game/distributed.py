@@ -0,0 +1,478 @@
+"""Spread game simulation over worker processes on any number of hosts.
+
+A Coordinator hands out work units (an experiment's agents, options and a
+list of seeds) over TCP or a Unix socket; workers play the games and stream
+back a (seed, winner, turns) result as each game finishes. A unit whose worker
+goes quiet for longer than its lease is handed out again, with only the seeds
+still missing, so every game is played at least once; results are keyed by
+(experiment, seed), so a game played twice is only counted once.
+
+Nothing on the wire is encrypted. Give coordinator and workers the same
+token so that only your workers can report results, and workers only build
+agent classes from an allowlist (the built-in agents by default), so a rogue
+coordinator cannot make them import arbitrary code.
+
+Run a coordinator and some workers from the command line:
+
+    python -m risk_ai_game.distributed coordinator 0.0.0.0:5555 --token SECRET \\
+        --store results.db --experiment a-vs-r --seeds 0 10000 \\
+        --agents '[{"class": "risk_ai_game.agent:AggressiveAgent"}, {"class": "risk_ai_game.agent:RandomAgent"}]'
+    python -m risk_ai_game.distributed worker coordinator-host:5555 --token SECRET
+
+Addresses are host:port for TCP, or a file path for a Unix socket.
+"""
+
+import argparse
+import hmac
+import json
+import multiprocessing
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from .agent import AgentSpec, AggressiveAgent, ExpectiminimaxAgent, PlanningAgent, RandomAgent
+from .maps import GameMap
+from .results import ResultsStore, _batch_options, play_seed
+
+_HEADER = struct.Struct("!I")
+# longest message receive_message accepts, so a bad length can't make it
+# allocate or wait for gigabytes.
+MAX_MESSAGE_BYTES = 1 << 20
+
+# agent classes workers build unless told otherwise, as "module:QualName".
+DEFAULT_ALLOWED_CLASSES = frozenset(
+    AgentSpec(cls).to_dict()["class"]
+    for cls in (RandomAgent, AggressiveAgent, PlanningAgent, ExpectiminimaxAgent)
+)
+
+
+def send_message(sock, message):
+    """Send one message: a 4 byte length, then that many bytes of JSON."""
+    data = json.dumps(message, separators=(",", ":")).encode()
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def receive_message(sock):
+    """Read one message, or return None if the other side closed the connection.
+
+    Raises ConnectionError for messages longer than MAX_MESSAGE_BYTES.
+    """
+    header = _receive_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    (length,) = _HEADER.unpack(header)
+    if length > MAX_MESSAGE_BYTES:
+        raise ConnectionError(f"message of {length} bytes is over the {MAX_MESSAGE_BYTES} byte limit")
+    data = _receive_exactly(sock, length)
+    if data is None:
+        raise ConnectionError("connection closed in the middle of a message")
+    return json.loads(data)
+
+
+def _receive_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _is_unix_address(address):
+    return "/" in address or ":" not in address
+
+
+def connect(address, timeout=None):
+    if _is_unix_address(address):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address)
+    else:
+        host, port = address.rsplit(":", 1)
+        sock = socket.create_connection((host, int(port)), timeout=timeout)
+    return sock
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            message = receive_message(self.request)
+            if message is None:
+                return
+            send_message(self.request, self.server.coordinator.handle(message))
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+# Hands out work units and collects their results.
+# Add jobs with add_job, then call run(), which serves workers until every
+# game is done. With a ResultsStore, seeds already stored are skipped when the
+# job is added and results are written to the store as they arrive, so a
+# crashed coordinator can be restarted with the same jobs.
+# A unit is handed out at most max_attempts times; after that many workers
+# reported an error for it or let its lease run out, it is given up on and
+# listed in failed, so run() still returns.
+class Coordinator:
+    def __init__(
+        self,
+        address: str,
+        store: Optional[ResultsStore] = None,
+        # seeds per work unit.
+        unit_size: int = 50,
+        # seconds a worker may go without reporting a game before its unit
+        # is handed out again.
+        lease_seconds: float = 300.0,
+        # shared secret every worker message must carry, None to accept anyone.
+        token: Optional[str] = None,
+        max_attempts: int = 3,
+    ) -> None:
+        self.address = address
+        self.store = store
+        self.unit_size = unit_size
+        self.lease_seconds = lease_seconds
+        self.token = token
+        self.max_attempts = max_attempts
+
+        self._lock = threading.Lock()
+        self._units: dict[str, dict] = {}
+        # seeds of each unit that have no result yet.
+        self._remaining: dict[str, set[int]] = {}
+        self._pending: deque[str] = deque()
+        # unit id -> lease deadline
+        self._leased: dict[str, float] = {}
+        # unit id -> times handed out
+        self._attempts: dict[str, int] = {}
+        # unit id -> why it was given up on
+        self.failed: dict[str, str] = {}
+        # (experiment, seed) pairs in some unit, so overlapping jobs add nothing twice.
+        self._queued: set[tuple[str, int]] = set()
+        # (experiment, seed) -> (winner, winner name, turns)
+        self.results: dict[tuple[str, int], tuple[int, Optional[str], int]] = {}
+        # results not yet written to the store, drained by run().
+        self._incoming: queue.Queue = queue.Queue()
+
+    def add_job(
+        self,
+        experiment: str,
+        agents: list[AgentSpec],
+        seeds,
+        max_turns: int = 500,
+        # None for the classic map.
+        game_map: Optional[GameMap] = None,
+    ) -> None:
+        agent_dicts = [spec.to_dict() for spec in agents]
+        options = _batch_options(max_turns, game_map=game_map)
+        done = set()
+        if self.store is not None:
+            self.store.check_experiment(experiment, agent_dicts, options)
+            done = self.store.recorded_seeds(experiment)
+        with self._lock:
+            seeds = [
+                s for s in dict.fromkeys(seeds)
+                if s not in done and (experiment, s) not in self._queued
+            ]
+            for start in range(0, len(seeds), self.unit_size):
+                unit_seeds = seeds[start:start + self.unit_size]
+                unit_id = f"{experiment}:{len(self._units)}"
+                self._units[unit_id] = {
+                    "id": unit_id,
+                    "experiment": experiment,
+                    "agents": agent_dicts,
+                    "max_turns": max_turns,
+                    "game_map": None if game_map is None else game_map.to_dict(),
+                    "options": options,
+                    "seeds": unit_seeds,
+                }
+                self._remaining[unit_id] = set(unit_seeds)
+                self._queued.update((experiment, s) for s in unit_seeds)
+                self._pending.append(unit_id)
+
+    @property
+    def finished(self) -> bool:
+        with self._lock:
+            # a unit whose last attempt ran out of time is only failed here.
+            self._requeue_expired()
+            return self._all_done()
+
+    def _all_done(self) -> bool:
+        return all(
+            not remaining or unit_id in self.failed
+            for unit_id, remaining in self._remaining.items()
+        )
+
+    def handle(self, message: dict) -> dict:
+        """Answer one worker message. Called from the server's threads."""
+        if not isinstance(message, dict):
+            return {"type": "error", "error": "messages must be JSON objects"}
+        # compared as bytes: compare_digest refuses str that is not ASCII.
+        if self.token is not None and not hmac.compare_digest(
+            str(message.get("token", "")).encode(), self.token.encode()
+        ):
+            return {"type": "error", "error": "bad token"}
+        kind = message.get("type")
+        if kind == "request":
+            return self._hand_out()
+        if kind == "result":
+            self._receive(message)
+            return {"type": "ack"}
+        if kind == "error":
+            self._unit_error(message)
+            return {"type": "ack"}
+        return {"type": "error", "error": f"unknown message type {kind!r}"}
+
+    def _hand_out(self) -> dict:
+        with self._lock:
+            self._requeue_expired()
+            while self._pending:
+                unit_id = self._pending.popleft()
+                remaining = self._remaining[unit_id]
+                if not remaining or unit_id in self.failed:
+                    continue
+                self._leased[unit_id] = time.monotonic() + self.lease_seconds
+                self._attempts[unit_id] = self._attempts.get(unit_id, 0) + 1
+                unit = self._units[unit_id]
+                # a unit handed out again only needs the games still missing.
+                seeds = [s for s in unit["seeds"] if s in remaining]
+                return {"type": "work", "unit": {**unit, "seeds": seeds}}
+            if self._all_done():
+                return {"type": "done"}
+            # everything is out with other workers; ask again later in case one fails.
+            return {"type": "wait", "seconds": 1.0}
+
+    def _requeue_expired(self) -> None:
+        now = time.monotonic()
+        for unit_id, deadline in list(self._leased.items()):
+            if deadline < now:
+                self._retry(unit_id, f"lease expired after {self.lease_seconds} seconds")
+
+    def _retry(self, unit_id: str, error: str) -> None:
+        # the unit's lease is over: hand it out again, or give up on it.
+        del self._leased[unit_id]
+        if self._attempts[unit_id] >= self.max_attempts:
+            self.failed[unit_id] = error
+        else:
+            self._pending.append(unit_id)
+
+    def _unit_error(self, message: dict) -> None:
+        with self._lock:
+            unit_id = message.get("unit_id")
+            # a unit that is not leased was already retried when its lease ran out.
+            if unit_id in self._leased:
+                self._retry(unit_id, str(message.get("error")))
+
+    def _receive(self, message: dict) -> None:
+        unit_id = message["unit_id"]
+        with self._lock:
+            unit = self._units.get(unit_id)
+            if unit is None:
+                return
+            remaining = self._remaining[unit_id]
+            fresh = []
+            for seed, winner, winner_name, turns in message["results"]:
+                key = (unit["experiment"], seed)
+                if seed in remaining and key not in self.results:
+                    self.results[key] = (winner, winner_name, turns)
+                    remaining.discard(seed)
+                    fresh.append((seed, winner, winner_name, turns))
+            if not remaining:
+                self._leased.pop(unit_id, None)
+            elif unit_id in self._leased:
+                # each reported game shows the worker is alive, so extend its lease.
+                self._leased[unit_id] = time.monotonic() + self.lease_seconds
+        if fresh:
+            self._incoming.put((unit, fresh))
+
+    def _flush(self) -> None:
+        while True:
+            try:
+                unit, fresh = self._incoming.get_nowait()
+            except queue.Empty:
+                return
+            if self.store is None:
+                continue
+            self.store.add_results({
+                "experiment": unit["experiment"],
+                "seed": seed,
+                "agents": unit["agents"],
+                "options": unit["options"],
+                "winner": winner,
+                "winner_name": winner_name,
+                "turns": turns,
+            } for seed, winner, winner_name, turns in fresh)
+
+    def run(self, poll_seconds: float = 0.2, linger_seconds: float = 2.0) -> dict:
+        """Serve workers until all games are done. Returns the results."""
+        if _is_unix_address(self.address):
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+            server = _UnixServer(self.address, _Handler)
+        else:
+            host, port = self.address.rsplit(":", 1)
+            server = _TCPServer((host, int(port)), _Handler)
+        server.coordinator = self
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            while not self.finished:
+                time.sleep(poll_seconds)
+                self._flush()
+            # keep answering "done" for a moment so waiting workers exit cleanly.
+            time.sleep(linger_seconds)
+            self._flush()
+        finally:
+            server.shutdown()
+            server.server_close()
+            if _is_unix_address(self.address) and os.path.exists(self.address):
+                os.unlink(self.address)
+        return self.results
+
+
+def play_unit(unit: dict, allowed_classes=DEFAULT_ALLOWED_CLASSES):
+    """Play every seed of a work unit, yielding [seed, winner, winner name, turns] rows.
+
+    Raises ValueError for agent classes not in allowed_classes, before importing them.
+    """
+    for d in unit["agents"]:
+        if d["class"] not in allowed_classes:
+            raise ValueError(f"agent class {d['class']!r} is not allowed on this worker")
+    specs = [AgentSpec.from_dict(d) for d in unit["agents"]]
+    game_map = None if unit.get("game_map") is None else GameMap.from_dict(unit["game_map"])
+    for seed in unit["seeds"]:
+        record = play_seed(specs, seed, unit["max_turns"], game_map=game_map)
+        yield [seed, record["winner"], record["winner_name"], record["turns"]]
+
+
+# Ask the coordinator for work until it says everything is done.
+# Each game's result is sent as soon as it is played, over one connection per
+# unit; a new connection is made for every request, so a restarted coordinator
+# is picked up again. A unit that cannot be played (a class that is not
+# allowed, bad parameters) is reported to the coordinator as an error and the
+# worker moves on. Gives up after retries failed connection attempts in a row.
+# Returns the number of units played.
+def run_worker(
+    address: str,
+    token: Optional[str] = None,
+    allowed_classes=DEFAULT_ALLOWED_CLASSES,
+    retries: int = 10,
+    retry_seconds: float = 1.0,
+) -> int:
+    units = 0
+    failures = 0
+    while True:
+        try:
+            with connect(address) as sock:
+                send_message(sock, {"type": "request", "token": token})
+                reply = receive_message(sock)
+        except OSError:
+            failures += 1
+            if failures > retries:
+                return units
+            time.sleep(retry_seconds)
+            continue
+        failures = 0
+
+        if reply is None or reply["type"] == "done":
+            return units
+        if reply["type"] == "error":
+            raise RuntimeError(f"coordinator refused the request: {reply['error']}")
+        if reply["type"] == "wait":
+            time.sleep(reply.get("seconds", 1.0))
+            continue
+
+        unit = reply["unit"]
+        try:
+            with connect(address) as sock:
+                try:
+                    for row in play_unit(unit, allowed_classes):
+                        send_message(sock, {
+                            "type": "result", "token": token, "unit_id": unit["id"], "results": [row],
+                        })
+                        if receive_message(sock) is None:
+                            raise ConnectionError("coordinator closed the connection")
+                except OSError:
+                    raise
+                except Exception as e:
+                    send_message(sock, {
+                        "type": "error", "token": token, "unit_id": unit["id"],
+                        "error": f"{type(e).__name__}: {e}",
+                    })
+                    receive_message(sock)
+                    continue
+        except OSError:
+            # the lease will run out and the missing games will be handed out again.
+            continue
+        units += 1
+
+
+def spawn_local_workers(address: str, count: int, token: Optional[str] = None) -> list[multiprocessing.Process]:
+    """Start count worker processes on this machine, e.g. for testing."""
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(address, token), daemon=True)
+        for _ in range(count)
+    ]
+    for w in workers:
+        w.start()
+    return workers
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Distributed Risk game simulation.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    worker = sub.add_parser("worker", help="play games for a coordinator")
+    worker.add_argument("address")
+    worker.add_argument("--allow", action="append", default=[], metavar="MODULE:CLASS",
+                        help="also allow this agent class (the built-in agents always are)")
+
+    coordinator = sub.add_parser("coordinator", help="hand out games to workers")
+    coordinator.add_argument("address")
+    coordinator.add_argument("--store", required=True, help="SQLite results file")
+    coordinator.add_argument("--experiment", required=True)
+    coordinator.add_argument("--agents", required=True,
+                             help='JSON list of {"class": "module:Class", "params": {...}}')
+    coordinator.add_argument("--seeds", type=int, nargs=2, metavar=("START", "STOP"), required=True)
+    coordinator.add_argument("--max-turns", type=int, default=500)
+    coordinator.add_argument("--unit-size", type=int, default=50)
+    coordinator.add_argument("--lease-seconds", type=float, default=300.0)
+    coordinator.add_argument("--max-attempts", type=int, default=3)
+    coordinator.add_argument("--local-workers", type=int, default=0,
+                             help="also start this many workers on this machine")
+
+    for p in (worker, coordinator):
+        p.add_argument("--token", default=os.environ.get("RISK_AI_GAME_TOKEN"),
+                       help="shared secret, defaults to $RISK_AI_GAME_TOKEN")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        units = run_worker(args.address, args.token, DEFAULT_ALLOWED_CLASSES | set(args.allow))
+        print(f"worker finished after {units} units")
+        return
+
+    with ResultsStore(args.store) as store:
+        coord = Coordinator(args.address, store, args.unit_size, args.lease_seconds, args.token, args.max_attempts)
+        agents = [AgentSpec.from_dict(d) for d in json.loads(args.agents)]
+        coord.add_job(args.experiment, agents, range(*args.seeds), args.max_turns)
+        spawn_local_workers(args.address, args.local_workers, args.token)
+        coord.run()
+        for unit_id, error in coord.failed.items():
+            print(f"gave up on unit {unit_id}: {error}")
+        print(f"{store.count(args.experiment)} games stored, win rates {store.win_rates(args.experiment)}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,183 @@
+"""Batched state features and evaluators, scoring many game states at once."""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+# Static per-map arrays used to compute features, see board_tables().
+class BoardTables:
+    def __init__(self, game_map):
+        size = len(game_map)
+        # adjacency in the map's CSR form, used to sum over neighbors.
+        self.indptr = np.asarray(game_map.indptr, dtype=np.int64)
+        self.indices = np.asarray(game_map.indices, dtype=np.int64)
+        # territories with at least one neighbor, the rows reduceat can sum.
+        self.with_neighbors = np.flatnonzero(self.indptr[1:] > self.indptr[:-1])
+
+        self.continents = list(dict.fromkeys(game_map.continents))
+        self.membership = np.zeros((size, len(self.continents)), dtype=np.float32)
+        column = {c: i for i, c in enumerate(self.continents)}
+        for i, c in enumerate(game_map.continents):
+            self.membership[i, column[c]] = 1.0
+        self.continent_sizes = self.membership.sum(axis=0)
+        self.bonuses = np.array(
+            [game_map.bonuses.get(c, 0) for c in self.continents], dtype=np.float32
+        )
+
+        self.feature_names = (
+            ["territory_share", "army_share"]
+            + [f"continent:{c}" for c in self.continents]
+            + ["border_pressure", "reinforcement_share"]
+        )
+
+    def neighbor_sums(self, values):
+        """For (states, territories) values, the sum over each territory's neighbors."""
+        sums = np.zeros_like(values)
+        if len(self.with_neighbors):
+            # reduceat can't sum empty rows, so only the others are summed and
+            # territories without neighbors keep 0.
+            starts = self.indptr[self.with_neighbors]
+            sums[:, self.with_neighbors] = np.add.reduceat(values[:, self.indices], starts, axis=1)
+        return sums
+
+
+@lru_cache(maxsize=16)
+def _tables_for_map(game_map):
+    return BoardTables(game_map)
+
+
+def board_tables(board):
+    """BoardTables for board, built once per map."""
+    return _tables_for_map(board.map)
+
+
+def state_arrays(game_states):
+    """(owners, armies) arrays of shape (states, territories). Unowned territories are -1."""
+    owners = np.array(
+        [[-1 if t.owner is None else t.owner for t in gs.board.all_territories()] for gs in game_states],
+        dtype=np.int32,
+    )
+    armies = np.array(
+        [[t.armies for t in gs.board.all_territories()] for gs in game_states],
+        dtype=np.float32,
+    )
+    return owners, armies
+
+
+def features_from_arrays(owners, armies, player_id, num_players, tables):
+    """Feature matrix (states, features) from owner/army arrays, see BoardTables.feature_names.
+
+    Features, all in [0, 1]:
+      territory_share      fraction of territories held.
+      army_share           fraction of all armies that are ours.
+      continent:<name>     fraction of each continent held.
+      border_pressure      enemy armies next to our territories, as a share of
+                           those plus our armies on the border.
+      reinforcement_share  our share of the reinforcements all players would get.
+    """
+    owners = np.asarray(owners)
+    armies = np.asarray(armies, dtype=np.float32)
+    mine = (owners == player_id).astype(np.float32)
+    enemy = ((owners != player_id) & (owners >= 0)).astype(np.float32)
+
+    territory_share = mine.mean(axis=1)
+    army_share = (armies * mine).sum(axis=1) / np.maximum(armies.sum(axis=1), 1.0)
+    continent_fraction = (mine @ tables.membership) / tables.continent_sizes
+
+    # enemy armies adjacent to each territory, counted on our territories only.
+    adjacent_enemy = tables.neighbor_sums(armies * enemy)
+    pressure = (adjacent_enemy * mine).sum(axis=1)
+    defending = (armies * mine * (adjacent_enemy > 0)).sum(axis=1)
+    border_pressure = pressure / np.maximum(pressure + defending, 1.0)
+
+    # the same rule as GameState.get_reinforcements, for every player at once.
+    reinforcements = []
+    for p in range(num_players):
+        held = (owners == p).astype(np.float32)
+        base = np.maximum(3.0, np.floor(held.sum(axis=1) / 3.0))
+        complete = (held @ tables.membership) >= tables.continent_sizes
+        alive = held.sum(axis=1) > 0
+        reinforcements.append(np.where(alive, base + complete @ tables.bonuses, 0.0))
+    reinforcements = np.stack(reinforcements, axis=1)
+    reinforcement_share = reinforcements[:, player_id] / np.maximum(reinforcements.sum(axis=1), 1.0)
+
+    return np.column_stack([
+        territory_share,
+        army_share,
+        continent_fraction,
+        border_pressure,
+        reinforcement_share,
+    ]).astype(np.float32)
+
+
+def extract_features(game_states, player_id):
+    """Feature matrix for one GameState or a list of them (all on the same map)."""
+    if not isinstance(game_states, (list, tuple)):
+        game_states = [game_states]
+    owners, armies = state_arrays(game_states)
+    tables = board_tables(game_states[0].board)
+    num_players = max(gs.num_players for gs in game_states)
+    return features_from_arrays(owners, armies, player_id, num_players, tables)
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+# Scores a feature matrix with one matrix multiply: sigmoid(features @ weights + bias).
+# Scores are in (0, 1), higher is better for the player the features were built for.
+class LinearEvaluator:
+    def __init__(self, weights, bias=0.0):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.float32(bias)
+
+    def evaluate(self, features):
+        return _sigmoid(np.asarray(features, dtype=np.float32) @ self.weights + self.bias)
+
+    def evaluate_states(self, game_states, player_id):
+        return self.evaluate(extract_features(game_states, player_id))
+
+    def save(self, path):
+        np.savez(path, kind="linear", weights=self.weights, bias=self.bias)
+
+
+# One tanh hidden layer: sigmoid(tanh(features @ w1 + b1) @ w2 + b2).
+class MLPEvaluator:
+    def __init__(self, w1, b1, w2, b2=0.0):
+        self.w1 = np.asarray(w1, dtype=np.float32)
+        self.b1 = np.asarray(b1, dtype=np.float32)
+        self.w2 = np.asarray(w2, dtype=np.float32)
+        self.b2 = np.float32(b2)
+
+    def evaluate(self, features):
+        hidden = np.tanh(np.asarray(features, dtype=np.float32) @ self.w1 + self.b1)
+        return _sigmoid(hidden @ self.w2 + self.b2)
+
+    def evaluate_states(self, game_states, player_id):
+        return self.evaluate(extract_features(game_states, player_id))
+
+    def save(self, path):
+        np.savez(path, kind="mlp", w1=self.w1, b1=self.b1, w2=self.w2, b2=self.b2)
+
+
+def load_evaluator(path):
+    """Load an evaluator saved with LinearEvaluator.save or MLPEvaluator.save."""
+    with np.load(path) as data:
+        kind = str(data["kind"])
+        if kind == "linear":
+            return LinearEvaluator(data["weights"], data["bias"])
+        if kind == "mlp":
+            return MLPEvaluator(data["w1"], data["b1"], data["w2"], data["b2"])
+    raise ValueError(f"Unknown evaluator kind in {path}: {kind}")
+
+
+def default_evaluator(board):
+    """Hand-set linear weights favoring territory, continents and reinforcements."""
+    tables = board_tables(board)
+    weights = (
+        [3.0, 1.0]
+        + [0.5 * float(b) / max(1.0, float(tables.bonuses.max())) for b in tables.bonuses]
+        + [-1.0, 2.0]
+    )
+    return LinearEvaluator(weights, bias=-2.5)
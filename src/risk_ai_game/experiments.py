@@ -0,0 +1,228 @@
+"""On-disk cache of experiment results, so notebooks don't replay games."""
+
+import hashlib
+import json
+import math
+import os
+import sys
+from collections.abc import Callable, Iterable
+from typing import Optional
+
+import numpy as np
+
+from . import __version__
+from .agent import AgentSpec
+from .fingerprint import _fingerprint, _hash_bytes
+from .game_state import GameState
+from .maps import GameMap
+from .results import _atomic_write, play_seed
+from .telemetry import GameTelemetry
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _package_source_hash():
+    """Hash of every module of this package: the rules and built-in agents."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(_PACKAGE_DIR)):
+        if name.endswith(".py"):
+            digest.update(name.encode())
+            with open(os.path.join(_PACKAGE_DIR, name), "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def experiment_config(
+    agents: list[AgentSpec],
+    max_turns: int,
+    initial_board_setup: Optional[Callable[[GameState], None]] = None,
+    telemetry_factory: Optional[Callable[[], list[GameTelemetry]]] = None,
+    game_map: Optional[GameMap] = None,
+    extra: Optional[dict] = None,
+) -> dict:
+    """Everything that decides a game's outcome except its seed, as plain JSON.
+
+    Raises ValueError if some part of it cannot be fingerprinted.
+    """
+    return {
+        "version": __version__,
+        "package_source": _package_source_hash(),
+        "agents": [
+            {"class": _fingerprint(spec.agent_class), "params": _fingerprint(spec.params)}
+            for spec in agents
+        ],
+        "max_turns": max_turns,
+        "initial_board_setup": _fingerprint(initial_board_setup),
+        "telemetry_factory": _fingerprint(telemetry_factory),
+        "game_map": None if game_map is None else _hash_bytes(
+            json.dumps(game_map.to_dict(), sort_keys=True).encode()
+        ),
+        "extra": _fingerprint(extra),
+    }
+
+
+def config_hash(config: dict) -> str:
+    return _hash_bytes(json.dumps(config, sort_keys=True).encode())[:16]
+
+
+# Results of one experiment configuration, one entry per seed, in seed order.
+# summaries holds a column per collector summary value, named
+# "<collector class>.<key>": numbers are float arrays (NaN where a game had no
+# value), anything else is JSON text.
+class ExperimentResults:
+    def __init__(self, seeds, winners, turns, summaries: dict[str, np.ndarray]) -> None:
+        self.seeds = seeds
+        self.winners = winners
+        self.turns = turns
+        self.summaries = summaries
+
+    def __len__(self) -> int:
+        return len(self.seeds)
+
+    def select(self, seeds: Iterable[int]) -> "ExperimentResults":
+        """The rows for the given seeds (which must all be present), in their order."""
+        rows = np.searchsorted(self.seeds, np.asarray(list(seeds), dtype=np.int64))
+        return ExperimentResults(
+            self.seeds[rows], self.winners[rows], self.turns[rows],
+            {k: v[rows] for k, v in self.summaries.items()},
+        )
+
+    def win_rates(self) -> dict[int, float]:
+        """Share of games won by each seat; -1 counts ties."""
+        if not len(self):
+            return {}
+        seats, counts = np.unique(self.winners, return_counts=True)
+        return {int(s): int(c) / len(self) for s, c in zip(seats, counts)}
+
+    def summary_values(self, column: str) -> list:
+        """A summary column as Python values, decoding JSON text columns."""
+        values = self.summaries[column]
+        if values.dtype.kind == "U":
+            return [json.loads(v) for v in values]
+        return values.tolist()
+
+    def save(self, path: str, config: dict) -> None:
+        arrays = {
+            "config": np.array(json.dumps(config, sort_keys=True)),
+            "seeds": self.seeds,
+            "winners": self.winners,
+            "turns": self.turns,
+        }
+        for name, values in self.summaries.items():
+            arrays[f"summary:{name}"] = values
+        _atomic_write(path, lambda f: np.savez_compressed(f, **arrays))
+
+    @classmethod
+    def load(cls, path: str) -> "ExperimentResults":
+        with np.load(path) as data:
+            summaries = {
+                key[len("summary:"):]: data[key]
+                for key in data.files if key.startswith("summary:")
+            }
+            return cls(data["seeds"], data["winners"], data["turns"], summaries)
+
+    @classmethod
+    def from_games(cls, games: list[tuple]) -> "ExperimentResults":
+        """Build from (seed, winner, turns, {column: value}) tuples."""
+        columns = sorted({name for *_, values in games for name in values})
+        summaries = {}
+        for name in columns:
+            values = [g[3].get(name) for g in games]
+            if all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values):
+                summaries[name] = np.array([math.nan if v is None else v for v in values], dtype=np.float64)
+            else:
+                summaries[name] = np.array([json.dumps(v) for v in values])
+        return cls(
+            np.array([g[0] for g in games], dtype=np.int64),
+            np.array([g[1] for g in games], dtype=np.int16),
+            np.array([g[2] for g in games], dtype=np.int32),
+            summaries,
+        )
+
+    def to_games(self) -> list[tuple]:
+        columns = {name: self.summary_values(name) for name in self.summaries}
+        return [
+            (
+                int(seed), int(winner), int(turns),
+                {name: values[i] for name, values in columns.items()
+                 if not (isinstance(values[i], float) and math.isnan(values[i]))},
+            )
+            for i, (seed, winner, turns) in enumerate(zip(self.seeds, self.winners, self.turns))
+        ]
+
+
+def _flatten_summaries(summaries):
+    return {
+        f"{collector}.{key}": value
+        for collector, summary in summaries.items()
+        for key, value in summary.items()
+    }
+
+
+# Runs experiments through a cache directory with one .npz file per
+# configuration (see experiment_config), named by its hash. The seeds are not
+# part of the hash: each file holds one row per seed played so far, so asking
+# for more seeds only plays the new ones, and asking again costs one file read.
+# New games are saved every save_every games, so an interrupted run keeps what
+# it played.
+#
+# The hash covers the package version and source, max_turns, the map, and
+# fingerprints (see _fingerprint) of the agent classes and parameters, the
+# setup function and the telemetry factory. Code defined outside the package,
+# e.g. an agent written in a notebook, is fingerprinted by its bytecode, so
+# editing it invalidates the cache; parameters such as evaluators by their
+# contents. Anything that cannot be fingerprinted raises ValueError rather
+# than risk stale results. extra adds anything else the games depend on.
+class ExperimentCache:
+    def __init__(self, directory: str = ".experiment_cache", verbose: bool = True) -> None:
+        self.directory = directory
+        self.verbose = verbose
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, config: dict) -> str:
+        return os.path.join(self.directory, f"{config_hash(config)}.npz")
+
+    def run(
+        self,
+        agents: list[AgentSpec],
+        seeds: Iterable[int],
+        max_turns: int = 500,
+        initial_board_setup: Optional[Callable[[GameState], None]] = None,
+        telemetry_factory: Optional[Callable[[], list[GameTelemetry]]] = None,
+        game_map: Optional[GameMap] = None,
+        extra: Optional[dict] = None,
+        save_every: int = 100,
+    ) -> ExperimentResults:
+        seeds = list(dict.fromkeys(seeds))
+        config = experiment_config(
+            agents, max_turns, initial_board_setup, telemetry_factory, game_map, extra
+        )
+        path = self.path(config)
+        cached = ExperimentResults.load(path) if os.path.exists(path) else None
+        have = set() if cached is None else set(cached.seeds.tolist())
+        missing = [s for s in seeds if s not in have]
+
+        if missing:
+            games = [] if cached is None else cached.to_games()
+            for i, seed in enumerate(missing):
+                collectors = telemetry_factory() if telemetry_factory is not None else []
+                record = play_seed(agents, seed, max_turns, initial_board_setup, collectors, game_map)
+                games.append((
+                    seed, record["winner"], record["turns"], _flatten_summaries(record["summaries"]),
+                ))
+                if self.verbose:
+                    print(f"\rplayed {i + 1}/{len(missing)} games", end="", file=sys.stderr)
+                if (i + 1) % save_every == 0:
+                    _save_games(games, path, config)
+            if self.verbose:
+                print(file=sys.stderr)
+            cached = _save_games(games, path, config)
+
+        return cached.select(seeds)
+
+
+def _save_games(games, path, config):
+    games.sort(key=lambda g: g[0])
+    results = ExperimentResults.from_games(games)
+    results.save(path, config)
+    return results
@@ -0,0 +1,187 @@
+"""JSON fingerprints of code and data, for keying stored and cached results."""
+
+import functools
+import hashlib
+import json
+import os
+import sys
+import types
+from array import array
+
+import numpy as np
+
+
+def _hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class _NoFingerprint(ValueError):
+    pass
+
+
+# Code fingerprinted by name only: this package (covered by the package source
+# hash), builtins, and anything from the standard library or site-packages.
+def _is_library_object(obj):
+    return _is_library_module(getattr(obj, "__module__", None))
+
+
+def _is_library_module(name):
+    if name == "__main__":
+        return False
+    if name == __package__ or (name or "").startswith(__package__ + "."):
+        return True
+    module = sys.modules.get(name or "")
+    path = getattr(module, "__file__", None)
+    if path is None:
+        return True
+    path = os.path.abspath(path)
+    return any(
+        path.startswith(os.path.abspath(prefix) + os.sep)
+        for prefix in {sys.prefix, sys.base_prefix, sys.exec_prefix}
+    ) or "site-packages" in path
+
+
+def _const_repr(value):
+    # frozenset order follows string hashes, which change between processes.
+    if isinstance(value, frozenset):
+        return "frozenset(" + repr(sorted(_const_repr(v) for v in value)) + ")"
+    if isinstance(value, tuple):
+        return "(" + ",".join(_const_repr(v) for v in value) + ")"
+    return repr(value)
+
+
+def _hash_code(code, digest, names):
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    names.update(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _hash_code(const, digest, names)
+        else:
+            digest.update(_const_repr(const).encode())
+
+
+# A function by what it does rather than by its source text, which notebooks
+# don't keep and which, for a lambda, includes the rest of the line: its
+# bytecode, constants and names (nested functions included), its defaults and
+# closure values, and every global it names (see _global_fingerprint).
+def _function_fingerprint(fn, seen):
+    digest = hashlib.sha256()
+    names = set()
+    _hash_code(fn.__code__, digest, names)
+    result = {
+        "code": digest.hexdigest(),
+        "defaults": _fingerprint(fn.__defaults__, seen),
+        "kwdefaults": _fingerprint(fn.__kwdefaults__, seen),
+        "closure": [_fingerprint(cell.cell_contents, seen) for cell in fn.__closure__ or ()],
+    }
+    result["uses"] = {
+        name: _global_fingerprint(fn.__globals__[name], names, seen)
+        for name in sorted(names)
+        # names that are not globals are attributes or builtins.
+        if name in fn.__globals__
+    }
+    return result
+
+
+# A global used by user code: data by value, user functions and classes by
+# their code, wherever they are imported from. A user module is covered by the
+# attributes of it that the code names (for helpers.f(), "f"); library modules
+# only by name.
+def _global_fingerprint(value, names, seen):
+    if not isinstance(value, types.ModuleType):
+        return _fingerprint(value, seen)
+    if _is_library_module(value.__name__):
+        return f"<module {value.__name__}>"
+    return {
+        "module": value.__name__,
+        "uses": {
+            name: _fingerprint(getattr(value, name), seen)
+            for name in sorted(names)
+            if hasattr(value, name)
+        },
+    }
+
+
+def _class_fingerprint(cls, seen):
+    path = f"{cls.__module__}:{cls.__qualname__}"
+    if _is_library_object(cls):
+        return path
+    members = {}
+    for name, value in sorted(vars(cls).items()):
+        if name in ("__dict__", "__weakref__", "__module__", "__qualname__", "__doc__", "_abc_impl"):
+            continue
+        if isinstance(value, (staticmethod, classmethod)):
+            value = value.__func__
+        if isinstance(value, property):
+            value = [value.fget, value.fset, value.fdel]
+        members[name] = _fingerprint(value, seen)
+    return {
+        "class": path,
+        "bases": [_fingerprint(base, seen) for base in cls.__bases__],
+        "members": members,
+    }
+
+
+def _fingerprint(value, seen=None):
+    """A JSON form of value that changes whenever value's behavior could.
+
+    Objects are fingerprinted by class and public attributes. Raises
+    ValueError for anything that cannot be fingerprinted, since caching
+    results under a key that misses changes would return stale results.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_fingerprint(v, seen) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _fingerprint(v, seen) for k, v in value.items()}
+    if isinstance(value, (set, frozenset)):
+        items = [_fingerprint(v, seen) for v in value]
+        return sorted(items, key=lambda f: json.dumps(f, sort_keys=True))
+    if isinstance(value, (np.ndarray, np.generic)):
+        data = np.ascontiguousarray(value)
+        return {"dtype": str(data.dtype), "shape": list(data.shape),
+                "data": _hash_bytes(data.tobytes())}
+
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return f"<recursive {getattr(value, '__qualname__', type(value).__qualname__)}>"
+    seen.add(id(value))
+    try:
+        if isinstance(value, type):
+            return _class_fingerprint(value, seen)
+        if isinstance(value, types.FunctionType):
+            # the package's own functions are covered by the package source hash.
+            if _is_library_object(value):
+                return f"{value.__module__}:{value.__qualname__}"
+            return _function_fingerprint(value, seen)
+        if isinstance(value, types.MethodType):
+            return {"method": _fingerprint(value.__func__, seen),
+                    "self": _fingerprint(value.__self__, seen)}
+        if isinstance(value, functools.partial):
+            return {"partial": _fingerprint(value.func, seen),
+                    "args": _fingerprint(value.args, seen),
+                    "keywords": _fingerprint(value.keywords, seen)}
+        if isinstance(value, types.BuiltinFunctionType):
+            return f"{value.__module__}:{value.__qualname__}"
+        if isinstance(value, types.ModuleType):
+            return f"<module {value.__name__}>"
+        if isinstance(value, array):
+            return {"array": value.typecode, "data": _hash_bytes(value.tobytes())}
+        if hasattr(value, "__dict__"):
+            # underscore attributes are taken to be caches, like SetupLibrary._checked_map.
+            state = {k: v for k, v in vars(value).items() if not k.startswith("_")}
+            return {"object": _class_fingerprint(type(value), seen),
+                    "state": _fingerprint(state, seen)}
+    finally:
+        seen.discard(id(value))
+    raise _NoFingerprint(
+        f"cannot fingerprint {type(value).__qualname__} {value!r}, "
+        "so results that depend on it cannot be cached safely"
+    )
+
+
+def fingerprint_hash(value) -> str:
+    """A short hash of value's fingerprint. Raises ValueError like _fingerprint."""
+    return _hash_bytes(json.dumps(_fingerprint(value), sort_keys=True).encode())[:16]
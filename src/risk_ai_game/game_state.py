@@ -1,28 +1,33 @@
 """Game state and logic for Risk."""
 
-from .board import Board
+from collections import deque
+
+from .analysis import PlayerAnalysis, sorted_insert, sorted_remove
+from .board import Board, CONTINENT_BONUSES
 from .action import Phase, DeployAction, AttackAction, FortifyAction, EndPhaseAction
 import random
 
-# continent bonuses (from the rulebook)
-CONTINENT_BONUSES = {
-    "North America": 5,
-    "South America": 2,
-    "Europe": 5,
-    "Africa": 3,
-    "Asia": 7,
-    "Australia": 2,
-}
-
 
 class GameState:
-    def __init__(self, num_players=2):
-        self.board = Board()
+    def __init__(self, num_players=2, game_map=None):
+        # game_map defaults to the classic world map, see maps.py for others.
+        self.board = Board(game_map)
         self.num_players = num_players
         self.current_player = 0
         self.phase = Phase.DEPLOY
         self.armies_to_deploy = 0
         self.turn_number = 0
+        # bumped whenever territory ownership / army counts change.
+        # cached analysis views are rebuilt when these move on.
+        self.ownership_version = 0
+        self.army_version = 0
+        self._analysis_cache = {}
+        # (territory, old owner, new owner) for each ownership change since
+        # _log_start, so caches can catch up without rescanning the board.
+        self._ownership_log = []
+        self._log_start = 0
+        self._owned = {}
+        self._owned_version = -1
 
     def setup_random(self):
         """Randomly deal out territories and put 1 army on each."""
@@ -31,14 +36,68 @@ class GameState:
         for i, t in enumerate(territories):
             t.owner = i % self.num_players
             t.armies = 1
+        self.invalidate()
         self.armies_to_deploy = self.get_reinforcements(self.current_player)
 
+    def invalidate(self):
+        """Mark the board as changed. Call after editing territories directly."""
+        self.ownership_version += 1
+        self.army_version += 1
+        self._ownership_log = []
+        self._log_start = self.ownership_version
+
+    def ownership_changes_since(self, version):
+        """(name, old owner, new owner) changes since version, or None if not known."""
+        if version < self._log_start:
+            return None
+        return self._ownership_log[version - self._log_start:]
+
+    def _record_ownership_change(self, territory, new_owner):
+        # a long log is no cheaper to replay than a rescan.
+        if len(self._ownership_log) > 4 * len(self.board.by_index):
+            self._ownership_log = []
+            self._log_start = self.ownership_version
+        self._ownership_log.append((territory.name, territory.owner, new_owner))
+        territory.owner = new_owner
+        self.ownership_version += 1
+
+    def analysis(self, player_id):
+        """Cached PlayerAnalysis for player_id, valid until the board changes."""
+        view = self._analysis_cache.get(player_id)
+        if view is None:
+            view = PlayerAnalysis(self, player_id)
+            self._analysis_cache[player_id] = view
+        else:
+            view._update(self)
+        return view
+
+    def _territories_by_owner(self):
+        # owner -> territories in board order, kept up to date with ownership changes.
+        if self._owned_version != self.ownership_version:
+            changes = self.ownership_changes_since(self._owned_version)
+            if changes is None:
+                owned = {}
+                for t in self.board.all_territories():
+                    owned.setdefault(t.owner, []).append(t)
+                self._owned = owned
+            else:
+                key = self.board.index_of
+                for name, old_owner, new_owner in changes:
+                    t = self.board.get(name)
+                    sorted_remove(self._owned[old_owner], t, key)
+                    sorted_insert(self._owned.setdefault(new_owner, []), t, key)
+            self._owned_version = self.ownership_version
+        return self._owned
+
     def get_player_territories(self, player_id):
-        return [t for t in self.board.all_territories() if t.owner == player_id]
+        return list(self._territories_by_owner().get(player_id, ()))
+
+    def count_player_territories(self, player_id):
+        return len(self._territories_by_owner().get(player_id, ()))
 
     def get_reinforcements(self, player_id):
         """Calculate how many armies a player gets. base + continent bonuses"""
-        territories = self.get_player_territories(player_id)
+        territories = self._territories_by_owner().get(player_id, ())
         base = max(3, len(territories) // 3)
 
         # check continent bonuses
@@ -46,15 +105,11 @@ class GameState:
         for t in territories:
             continent_counts[t.continent] = continent_counts.get(t.continent, 0) + 1
 
-        all_territories = self.board.all_territories()
-        continent_totals = {}
-        for t in all_territories:
-            continent_totals[t.continent] = continent_totals.get(t.continent, 0) + 1
-
+        continent_totals = self.board.map.continent_sizes
         bonus = 0
-        for continent, total in continent_totals.items():
-            if continent_counts.get(continent, 0) == total:
-                bonus += CONTINENT_BONUSES.get(continent, 0)
+        for continent, count in continent_counts.items():
+            if count == continent_totals[continent]:
+                bonus += self.board.continent_bonuses.get(continent, 0)
 
         return base + bonus
 
@@ -71,6 +126,63 @@ class GameState:
         else:
             raise ValueError(f"Unknown action type: {type(action)}")
 
+    def execute_plan(self, plan, on_before_action=None, on_action=None):
+        """Play a whole TurnPlan for the current player.
+
+        Returns a list of (action, result) steps in the order they were applied.
+        on_before_action(game_state) / on_action(game_state, action, result) are
+        called around each step, like run_game does for single actions.
+        """
+        if self.phase != Phase.DEPLOY:
+            raise ValueError(f"Plans start in the deploy phase, not {self.phase}")
+
+        player = self.current_player
+        steps = []
+
+        def step(action):
+            if on_before_action is not None:
+                on_before_action(self)
+            result = self.apply_action(action)
+            if on_action is not None:
+                on_action(self, action, result)
+            steps.append((action, result))
+            return result
+
+        for action in plan.deploy:
+            step(action)
+        if self.phase == Phase.DEPLOY:
+            raise ValueError(f"Plan left {self.armies_to_deploy} armies undeployed")
+
+        for order in plan.attacks:
+            attacker = self.board.get(order.from_territory)
+            defender = self.board.get(order.to_territory)
+            if attacker is None or defender is None:
+                raise ValueError("Invalid territory name")
+            min_armies = max(2, order.min_armies)
+            while (attacker.owner == player and defender.owner != player
+                   and attacker.armies >= min_armies):
+                num_dice = min(3, attacker.armies - 1)
+                if order.num_dice is not None:
+                    num_dice = min(num_dice, order.num_dice)
+                result = step(AttackAction(order.from_territory, order.to_territory, num_dice))
+                # a finished game has no more turns to play.
+                if "eliminated_player" in result and self.get_winner() is not None:
+                    return steps
+
+        step(EndPhaseAction())
+
+        fortify = plan.fortify
+        if fortify is not None:
+            src = self.board.get(fortify.from_territory)
+            dst = self.board.get(fortify.to_territory)
+            armies = min(fortify.armies, src.armies - 1) if src else 0
+            if (armies >= 1 and dst and src.owner == player and dst.owner == player
+                    and self._are_connected(fortify.from_territory, fortify.to_territory)):
+                step(FortifyAction(fortify.from_territory, fortify.to_territory, armies))
+                return steps
+        step(EndPhaseAction())
+        return steps
+
     def _apply_deploy(self, action):
         if self.phase != Phase.DEPLOY:
             raise ValueError(f"Cannot deploy during {self.phase} phase")
@@ -85,6 +197,7 @@ class GameState:
 
         territory.armies += action.armies
         self.armies_to_deploy -= action.armies
+        self.army_version += 1
 
         if self.armies_to_deploy == 0:
             self.phase = Phase.ATTACK
@@ -129,11 +242,12 @@ class GameState:
 
         attacker.armies -= attacker_losses
         defender.armies -= defender_losses
+        self.army_version += 1
 
         conquered = False
         if defender.armies <= 0:
             conquered = True
-            defender.owner = self.current_player
+            self._record_ownership_change(defender, self.current_player)
             # move armies in
             moved = action.num_dice
             attacker.armies -= moved
@@ -174,6 +288,7 @@ class GameState:
 
         src.armies -= action.armies
         dst.armies += action.armies
+        self.army_version += 1
         self._advance_turn()
 
         return {"from": action.from_territory, "to": action.to_territory, "armies": action.armies}
@@ -193,7 +308,7 @@ class GameState:
         # We must ensure that the next player is still in the game,
         # so we search through players until we find one that is still in the game.
         next_player = (self.current_player + 1) % self.num_players
-        while len(self.get_player_territories(next_player)) == 0:
+        while self.count_player_territories(next_player) == 0:
             next_player = (next_player + 1) % self.num_players
         self.current_player = next_player
         self.phase = Phase.DEPLOY
@@ -206,31 +321,57 @@ class GameState:
 
     def _are_connected(self, src_name, dst_name):
         """BFS to check if territories are connected through owned land."""
-        player = self.board.get(src_name).owner
-        visited = set()
-        queue = [src_name]
+        game_map = self.board.map
+        by_index = self.board.by_index
+        src = game_map.index[src_name]
+        dst = game_map.index[dst_name]
+        player = by_index[src].owner
+        visited = {src}
+        queue = deque([src])
         while queue:
-            current = queue.pop(0)
-            if current == dst_name:
+            current = queue.popleft()
+            if current == dst:
                 return True
-            if current in visited:
-                continue
-            visited.add(current)
-            t = self.board.get(current)
-            for n in t.neighbors:
-                nb = self.board.get(n)
-                if nb and nb.owner == player and n not in visited:
+            for n in game_map.neighbors(current):
+                if n not in visited and by_index[n].owner == player:
+                    visited.add(n)
                     queue.append(n)
         return False
 
+    def _connected_groups(self, player):
+        """The player's territories split into groups connected through their own land.
+
+        Each group lists its territories in board order.
+        """
+        game_map = self.board.map
+        by_index = self.board.by_index
+        seen = set()
+        groups = []
+        for t in self._territories_by_owner().get(player, ()):
+            start = game_map.index[t.name]
+            if start in seen:
+                continue
+            seen.add(start)
+            group = []
+            queue = deque([start])
+            while queue:
+                current = queue.popleft()
+                group.append(current)
+                for n in game_map.neighbors(current):
+                    if n not in seen and by_index[n].owner == player:
+                        seen.add(n)
+                        queue.append(n)
+            groups.append([by_index[i] for i in sorted(group)])
+        return groups
+
     def _check_elimination(self):
         for p in range(self.num_players):
-            if len(self.get_player_territories(p)) == 0:
+            if self.count_player_territories(p) == 0:
                 return p
         return None
 
     def get_winner(self):
-        alive = [p for p in range(self.num_players) if self.get_player_territories(p)]
+        alive = [p for p in range(self.num_players) if self.count_player_territories(p)]
         if len(alive) == 1:
             return alive[0]
         return None
@@ -259,11 +400,15 @@ class GameState:
 
         elif self.phase == Phase.FORTIFY:
             actions.append(EndPhaseAction())
+            group_of = {}
+            for group in self._connected_groups(player):
+                for t in group:
+                    group_of[t.name] = group
             for t in self.get_player_territories(player):
                 if t.armies < 2:
                     continue
-                for other in self.get_player_territories(player):
-                    if other.name != t.name and self._are_connected(t.name, other.name):
+                for other in group_of[t.name]:
+                    if other.name != t.name:
                         for n in range(1, t.armies):
                             actions.append(FortifyAction(t.name, other.name, n))
 
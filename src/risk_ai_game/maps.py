@@ -0,0 +1,220 @@
+"""Map topologies: loading from data files and procedural generation."""
+
+import json
+import math
+from array import array
+from typing import Optional
+
+import numpy as np
+
+
+# The static part of a board: territory names, continents, continent bonuses
+# and adjacency. Territories are numbered in order; the neighbors of
+# territory i are indices[indptr[i]:indptr[i + 1]] (CSR form), which stays
+# compact for maps with thousands of territories.
+# Maps never change once built, so copies of a game share the same map.
+class GameMap:
+    def __init__(self, names, continents, bonuses, indptr, indices, name="custom", svg_ids=None):
+        if len(names) != len(continents) or len(indptr) != len(names) + 1:
+            raise ValueError("names, continents and indptr do not match")
+        self.name = name
+        self.names = list(names)
+        self.continents = list(continents)
+        self.bonuses = dict(bonuses)
+        self.indptr = array("l", indptr)
+        self.indices = array("l", indices)
+        # optional territory name -> id in a rendered map.
+        self.svg_ids = svg_ids
+        self.index = {n: i for i, n in enumerate(self.names)}
+        if len(self.index) != len(self.names):
+            raise ValueError("territory names must be unique")
+
+        self.continent_sizes = {}
+        for c in self.continents:
+            self.continent_sizes[c] = self.continent_sizes.get(c, 0) + 1
+
+    @classmethod
+    def from_territories(cls, territories, bonuses, name="custom", svg_ids=None):
+        """Build from (name, continent, [neighbor names]) entries, like board.TERRITORIES."""
+        names = [t[0] for t in territories]
+        index = {n: i for i, n in enumerate(names)}
+        indptr = [0]
+        indices = []
+        for territory_name, _, neighbors in territories:
+            for n in neighbors:
+                if n not in index:
+                    raise ValueError(f"{territory_name} has unknown neighbor {n}")
+                indices.append(index[n])
+            indptr.append(len(indices))
+        game_map = cls(names, [t[1] for t in territories], bonuses, indptr, indices, name, svg_ids)
+        game_map.check_symmetric()
+        return game_map
+
+    def __len__(self):
+        return len(self.names)
+
+    # maps are immutable, so sharing is always safe and saves copying them per game.
+    def __deepcopy__(self, memo):
+        return self
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    def neighbors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def neighbor_names(self, i):
+        return [self.names[j] for j in self.neighbors(i)]
+
+    def degree(self, i):
+        return self.indptr[i + 1] - self.indptr[i]
+
+    def check_symmetric(self):
+        edges = set()
+        for i in range(len(self)):
+            for j in self.neighbors(i):
+                edges.add((i, j))
+        for i, j in edges:
+            if (j, i) not in edges:
+                raise ValueError(f"{self.names[i]} -> {self.names[j]} has no way back")
+
+    def is_connected(self):
+        if not self.names:
+            return True
+        seen = bytearray(len(self))
+        seen[0] = 1
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            for j in self.neighbors(i):
+                if not seen[j]:
+                    seen[j] = 1
+                    stack.append(j)
+        return all(seen)
+
+    def to_dict(self):
+        territories = []
+        for i, name in enumerate(self.names):
+            entry = {
+                "name": name,
+                "continent": self.continents[i],
+                "neighbors": self.neighbor_names(i),
+            }
+            if self.svg_ids and name in self.svg_ids:
+                entry["svg_id"] = self.svg_ids[name]
+            territories.append(entry)
+        return {"name": self.name, "bonuses": self.bonuses, "territories": territories}
+
+    @classmethod
+    def from_dict(cls, data):
+        territories = [(t["name"], t["continent"], t["neighbors"]) for t in data["territories"]]
+        svg_ids = {t["name"]: t["svg_id"] for t in data["territories"] if "svg_id" in t} or None
+        return cls.from_territories(territories, data["bonuses"], data.get("name", "custom"), svg_ids)
+
+
+# Map files are JSON:
+# {"name": ..., "bonuses": {continent: bonus}, "territories": [{"name": ...,
+#  "continent": ..., "neighbors": [names], "svg_id": optional}]}
+def load_map(path):
+    with open(path) as f:
+        return GameMap.from_dict(json.load(f))
+
+
+def save_map(game_map, path):
+    with open(path, "w") as f:
+        json.dump(game_map.to_dict(), f, indent=1)
+
+
+# Random connected map for scale testing.
+# Territories are random points in the unit square, each linked to its
+# `links` nearest points; extra links then join any disconnected pieces.
+# Continents are the regions closest to num_continents random centers, and a
+# continent's bonus is bonus_per_territory per territory it has (at least 1).
+def generate_map(
+    num_territories: int,
+    num_continents: int = 6,
+    links: int = 3,
+    bonus_per_territory: float = 0.5,
+    seed: Optional[int] = None,
+) -> GameMap:
+    if num_territories < 2:
+        raise ValueError("need at least 2 territories")
+    num_continents = max(1, min(num_continents, num_territories))
+    rng = np.random.default_rng(seed)
+    points = rng.random((num_territories, 2))
+
+    centers = points[rng.choice(num_territories, num_continents, replace=False)]
+    continent_of = np.argmin(((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2), axis=1)
+
+    k = min(links, num_territories - 1)
+    neighbors = [set() for _ in range(num_territories)]
+    # chunked so the distance matrix never has to exist all at once.
+    chunk = max(1, 2_000_000 // num_territories)
+    for start in range(0, num_territories, chunk):
+        block = points[start:start + chunk]
+        dist = ((block[:, None, :] - points[None, :, :]) ** 2).sum(axis=2)
+        dist[np.arange(len(block)), np.arange(start, start + len(block))] = np.inf
+        nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        for row, js in enumerate(nearest):
+            i = start + row
+            for j in js:
+                neighbors[i].add(int(j))
+                neighbors[int(j)].add(i)
+
+    _connect_components(points, neighbors)
+
+    names = [f"T{i}" for i in range(num_territories)]
+    continent_names = [f"C{c}" for c in range(num_continents)]
+    continents = [continent_names[c] for c in continent_of]
+    sizes = np.bincount(continent_of, minlength=num_continents)
+    bonuses = {
+        continent_names[c]: max(1, int(round(sizes[c] * bonus_per_territory)))
+        for c in range(num_continents)
+        if sizes[c] > 0
+    }
+
+    indptr = [0]
+    indices = []
+    for ns in neighbors:
+        indices.extend(sorted(ns))
+        indptr.append(len(indices))
+    return GameMap(names, continents, bonuses, indptr, indices,
+                   name=f"generated-{num_territories}-{seed}")
+
+
+def _connect_components(points, neighbors):
+    # label components, then link each component to the nearest point outside it
+    # until only one is left.
+    while True:
+        label = [-1] * len(neighbors)
+        components = []
+        for root in range(len(neighbors)):
+            if label[root] != -1:
+                continue
+            label[root] = len(components)
+            members = [root]
+            stack = [root]
+            while stack:
+                i = stack.pop()
+                for j in neighbors[i]:
+                    if label[j] == -1:
+                        label[j] = label[root]
+                        members.append(j)
+                        stack.append(j)
+            components.append(members)
+        if len(components) == 1:
+            return
+
+        labels = np.array(label)
+        for c, members in enumerate(components):
+            outside = np.flatnonzero(labels != c)
+            best = (math.inf, None, None)
+            for i in members:
+                dist = ((points[outside] - points[i]) ** 2).sum(axis=1)
+                j = int(np.argmin(dist))
+                if dist[j] < best[0]:
+                    best = (dist[j], i, int(outside[j]))
+            _, i, j = best
+            neighbors[i].add(j)
+            neighbors[j].add(i)
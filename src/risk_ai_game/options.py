@@ -3,6 +3,7 @@ from typing import Optional
 
 from .agent import Agent
 from .game_state import GameState
+from .maps import GameMap
 from .telemetry import GameTelemetry
 
 
@@ -21,6 +22,8 @@ class RiskAIGameOptions:
         initial_board_setup: Optional[Callable[[GameState], None]] = None,
         # You can provide a telemetry object to collect game statistics.
         game_telemetry: Optional[GameTelemetry] = None,
+        # The map to play on, the classic world map if not given.
+        game_map: Optional[GameMap] = None,
     ):
         if not agents:
             raise ValueError("agents must be a non-empty list")
@@ -30,3 +33,4 @@ class RiskAIGameOptions:
         self.random_seed = random_seed
         self.initial_board_setup = initial_board_setup
         self.game_telemetry = game_telemetry
+        self.game_map = game_map
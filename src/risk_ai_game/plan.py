@@ -0,0 +1,30 @@
+"""Whole-turn plans, an optional alternative to choosing one action at a time."""
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .action import DeployAction, FortifyAction
+
+
+# Keep attacking to_territory from from_territory while the attacker has at
+# least min_armies armies (and at least 2, the rule minimum).
+# Stops as soon as the target is conquered.
+# num_dice is capped by the armies available, None means "as many as possible".
+@dataclass
+class AttackOrder:
+    from_territory: str
+    to_territory: str
+    min_armies: int = 2
+    num_dice: Optional[int] = None
+
+
+# A full turn: deploys, then attack orders in order, then an optional fortify.
+# Deploys must place all armies for the turn.
+# Attack orders whose source was lost or whose target was already taken are skipped.
+# The fortify move is clamped to what the source can spare after the attacks,
+# and skipped if it is no longer legal.
+@dataclass
+class TurnPlan:
+    deploy: list[DeployAction] = field(default_factory=list)
+    attacks: list[AttackOrder] = field(default_factory=list)
+    fortify: Optional[FortifyAction] = None
@@ -52,8 +52,10 @@ BOARD_NAME_TO_SVG_ID = {
 # Convert GameState to a dictionary useable by rendering code below.
 def game_state_to_render_dict(game_state):
     result = {}
+    # maps loaded from a file may carry their own ids.
+    svg_ids = game_state.board.map.svg_ids or BOARD_NAME_TO_SVG_ID
     for t in game_state.board.all_territories():
-        svg_id = BOARD_NAME_TO_SVG_ID.get(t.name)
+        svg_id = svg_ids.get(t.name)
         if svg_id is not None and t.owner is not None:
             result[svg_id] = {"owner": t.owner, "armies": t.armies}
     return result
@@ -0,0 +1,278 @@
+"""Persistent, resumable storage of game results in SQLite."""
+
+import json
+import os
+import sqlite3
+from collections.abc import Callable, Iterable
+from typing import Optional
+
+from .agent import AgentSpec
+from .fingerprint import fingerprint_hash
+from .game_state import GameState
+from .maps import GameMap
+from .options import RiskAIGameOptions
+from .run import run_game
+from .telemetry import GameTelemetry, MultiTelemetry, TurnCountCollector
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    experiment TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    agents TEXT NOT NULL,
+    options TEXT NOT NULL,
+    -- seat of the winner, -1 for a tie.
+    winner INTEGER NOT NULL,
+    winner_name TEXT,
+    turns INTEGER NOT NULL,
+    summaries TEXT NOT NULL,
+    PRIMARY KEY (experiment, seed)
+)
+"""
+
+
+# One row per (experiment, seed). Recording a game twice keeps the first copy,
+# so re-running work that was already stored is harmless.
+# The database runs in WAL mode: readers (e.g. a notebook) don't block the
+# writer, and a crash loses at most the batch that was being written.
+class ResultsStore:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(_SCHEMA)
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_results(self, records: Iterable[dict]) -> None:
+        """Store many game records in one transaction. See run_batch for the record keys."""
+        rows = [
+            (
+                r["experiment"],
+                r["seed"],
+                json.dumps(r["agents"], default=repr),
+                json.dumps(r["options"], default=repr),
+                r["winner"],
+                r.get("winner_name"),
+                r["turns"],
+                json.dumps(r.get("summaries", {}), default=repr),
+            )
+            for r in records
+        ]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def check_experiment(self, experiment: str, agents: list, options: dict) -> None:
+        """Raise ValueError if experiment was stored with other agents or options.
+
+        agents and options are compared in the form they are stored in.
+        """
+        row = self.conn.execute(
+            "SELECT agents, options FROM games WHERE experiment = ? LIMIT 1", (experiment,)
+        ).fetchone()
+        if row is None:
+            return
+        stored_agents, stored_options = (json.loads(v) for v in row)
+        if stored_agents != json.loads(json.dumps(agents, default=repr)):
+            raise ValueError(
+                f"experiment {experiment!r} was stored with agents {stored_agents}, not {agents}"
+            )
+        if stored_options != json.loads(json.dumps(options, default=repr)):
+            raise ValueError(
+                f"experiment {experiment!r} was stored with options {stored_options}, not {options}"
+            )
+
+    def recorded_seeds(self, experiment: str) -> set[int]:
+        rows = self.conn.execute("SELECT seed FROM games WHERE experiment = ?", (experiment,))
+        return {seed for (seed,) in rows}
+
+    def count(self, experiment: str) -> int:
+        (n,) = self.conn.execute(
+            "SELECT COUNT(*) FROM games WHERE experiment = ?", (experiment,)
+        ).fetchone()
+        return n
+
+    def experiments(self) -> list[str]:
+        return [e for (e,) in self.conn.execute("SELECT DISTINCT experiment FROM games ORDER BY experiment")]
+
+    def win_rates(self, experiment: str) -> dict[int, float]:
+        """Fraction of games won from each seat, -1 being ties."""
+        rows = self.conn.execute(
+            """
+            SELECT winner, CAST(COUNT(*) AS REAL) / (SELECT COUNT(*) FROM games WHERE experiment = ?)
+            FROM games WHERE experiment = ? GROUP BY winner ORDER BY winner
+            """,
+            (experiment, experiment),
+        )
+        return dict(rows)
+
+    def win_rates_by_agent(self, experiment: str) -> dict[Optional[str], float]:
+        """Fraction of games won by each kind of agent, None being ties.
+
+        Agents are told apart by class and parameters, not by seat, so seats
+        played by the same kind of agent are counted together. Keys are the
+        class path, followed by the parameters as JSON if there are any.
+        """
+        rows = self.conn.execute(
+            """
+            SELECT
+                CASE WHEN winner >= 0 THEN json_extract(agents, '$[' || winner || '].class') END AS cls,
+                CASE WHEN winner >= 0 THEN json_extract(agents, '$[' || winner || '].params') END AS params,
+                COUNT(*)
+            FROM games WHERE experiment = ? GROUP BY cls, params
+            """,
+            (experiment,),
+        ).fetchall()
+        total = sum(count for *_, count in rows)
+        wins: dict[Optional[str], float] = {}
+        for cls, params, count in rows:
+            key = cls
+            # params come back as stored; re-dump them so key order doesn't matter.
+            if params is not None and json.loads(params):
+                key += " " + json.dumps(json.loads(params), sort_keys=True)
+            wins[key] = wins.get(key, 0) + count / total
+        return wins
+
+    def turn_stats(self, experiment: str) -> dict:
+        """Count, mean, min and max of the game lengths."""
+        n, mean, low, high = self.conn.execute(
+            "SELECT COUNT(*), AVG(turns), MIN(turns), MAX(turns) FROM games WHERE experiment = ?",
+            (experiment,),
+        ).fetchone()
+        return {"games": n, "mean": mean, "min": low, "max": high}
+
+    def iter_results(self, experiment: str):
+        """Yield stored records one at a time, without loading them all."""
+        rows = self.conn.execute(
+            """
+            SELECT seed, agents, options, winner, winner_name, turns, summaries
+            FROM games WHERE experiment = ? ORDER BY seed
+            """,
+            (experiment,),
+        )
+        for seed, agents, options, winner, winner_name, turns, summaries in rows:
+            yield {
+                "experiment": experiment,
+                "seed": seed,
+                "agents": json.loads(agents),
+                "options": json.loads(options),
+                "winner": winner,
+                "winner_name": winner_name,
+                "turns": turns,
+                "summaries": json.loads(summaries),
+            }
+
+
+# Write path through a temporary file and a rename, so readers and crashes
+# never see it half written. write is called with the open binary file.
+def _atomic_write(path: str, write: Callable) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+# Play one game with a fresh agent per spec (seat i gets agents[i]) and
+# return its record: seed, winner (-1 for a tie), winner_name, turns, and the
+# summary() of each of collectors under its class name.
+# The one place batch runners, tuners and workers play a seeded game.
+def play_seed(
+    agents: list[AgentSpec],
+    seed: int,
+    max_turns: int = 500,
+    initial_board_setup: Optional[Callable[[GameState], None]] = None,
+    collectors: Iterable[GameTelemetry] = (),
+    game_map: Optional[GameMap] = None,
+) -> dict:
+    collectors = list(collectors)
+    players = [spec.build(i) for i, spec in enumerate(agents)]
+    turns = TurnCountCollector()
+    winner = run_game(RiskAIGameOptions(
+        agents=players,
+        max_turns=max_turns,
+        verbose=False,
+        random_seed=seed,
+        initial_board_setup=initial_board_setup,
+        game_telemetry=MultiTelemetry([turns, *collectors]),
+        game_map=game_map,
+    ))
+    return {
+        "seed": seed,
+        "winner": winner,
+        "winner_name": players[winner].name if winner >= 0 else None,
+        "turns": turns.turns,
+        "summaries": {type(c).__name__: c.summary() for c in collectors},
+    }
+
+
+# The options stored with each game of a batch. initial_board_setup and
+# game_map are stored as fingerprint hashes, so two setup functions only match
+# if they do the same, and two maps only if they are the same map.
+def _batch_options(
+    max_turns: int,
+    initial_board_setup: Optional[Callable[[GameState], None]] = None,
+    game_map: Optional[GameMap] = None,
+) -> dict:
+    return {
+        "max_turns": max_turns,
+        "initial_board_setup": None if initial_board_setup is None else fingerprint_hash(initial_board_setup),
+        "game_map": None if game_map is None else fingerprint_hash(game_map.to_dict()),
+    }
+
+
+# Play one game per seed and store the results, skipping seeds the store already
+# has for this experiment, so an interrupted run can simply be started again.
+# Raises ValueError if the experiment was stored with other agents or options,
+# or if initial_board_setup cannot be fingerprinted.
+# Results are written every batch_size games; only one batch is held in memory.
+# telemetry_factory, if given, makes fresh collectors for each game; their
+# summary() output is stored with the result.
+# Returns the number of games played.
+def run_batch(
+    store: ResultsStore,
+    experiment: str,
+    agents: list[AgentSpec],
+    seeds: Iterable[int],
+    max_turns: int = 500,
+    initial_board_setup: Optional[Callable[[GameState], None]] = None,
+    telemetry_factory: Optional[Callable[[], list[GameTelemetry]]] = None,
+    batch_size: int = 100,
+    # None for the classic map.
+    game_map: Optional[GameMap] = None,
+) -> int:
+    agent_descriptions = [spec.to_dict() for spec in agents]
+    options = _batch_options(max_turns, initial_board_setup, game_map)
+    store.check_experiment(experiment, agent_descriptions, options)
+    done = store.recorded_seeds(experiment)
+
+    played = 0
+    pending = []
+    for seed in seeds:
+        if seed in done:
+            continue
+        collectors = telemetry_factory() if telemetry_factory is not None else []
+        record = play_seed(agents, seed, max_turns, initial_board_setup, collectors, game_map)
+        pending.append({
+            "experiment": experiment,
+            "agents": agent_descriptions,
+            "options": options,
+            **record,
+        })
+        played += 1
+        if len(pending) >= batch_size:
+            store.add_results(pending)
+            pending = []
+
+    if pending:
+        store.add_results(pending)
+    return played
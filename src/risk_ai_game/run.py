@@ -2,7 +2,7 @@
 
 import random
 
-from .action import AttackAction
+from .action import AttackAction, Phase
 from .game_state import GameState
 from .options import RiskAIGameOptions
 
@@ -14,9 +14,11 @@ def run_game(opts: RiskAIGameOptions) -> int:
     if opts.random_seed is not None:
         random.seed(opts.random_seed)
 
-    game = GameState(num_players=len(agents))
+    game = GameState(num_players=len(agents), game_map=opts.game_map)
     if opts.initial_board_setup is not None:
         opts.initial_board_setup(game)
+        # setup functions edit territories directly.
+        game.invalidate()
     else:
         game.setup_random()
 
@@ -31,24 +33,43 @@ def run_game(opts: RiskAIGameOptions) -> int:
             print(f"  {agent}: {len(territories)} territories")
         print()
 
+    # agents are asked for a whole turn plan once, at the start of each turn.
+    planned_turn = -1
     while game.get_winner() is None and game.turn_number < opts.max_turns:
         agent = agents[game.current_player]
-        if telemetry is not None:
-            telemetry.on_before_action(game)
-        action = agent.choose_action(game)
-        result = game.apply_action(action)
-        if telemetry is not None:
-            telemetry.on_action(game, action, result)
 
-        if opts.verbose and isinstance(action, AttackAction):
-            outcome = "CONQUERED" if result.get("conquered") else "repelled"
-            print(
-                f"  Turn {game.turn_number} | {agent} attacks "
-                f"{action.from_territory} -> {action.to_territory}: "
-                f"{result['attack_dice']} vs {result['defend_dice']} = {outcome}"
+        turn = game.turn_number
+        plan = None
+        if game.phase == Phase.DEPLOY and planned_turn != turn:
+            planned_turn = turn
+            plan = agent.plan_turn(game)
+
+        if plan is not None:
+            steps = game.execute_plan(
+                plan,
+                on_before_action=telemetry.on_before_action if telemetry is not None else None,
+                on_action=telemetry.on_action if telemetry is not None else None,
             )
-            if "eliminated_player" in result:
-                print(f"  *** Player {result['eliminated_player']} eliminated! ***")
+        else:
+            if telemetry is not None:
+                telemetry.on_before_action(game)
+            action = agent.choose_action(game)
+            result = game.apply_action(action)
+            if telemetry is not None:
+                telemetry.on_action(game, action, result)
+            steps = [(action, result)]
+
+        if opts.verbose:
+            for action, result in steps:
+                if isinstance(action, AttackAction):
+                    outcome = "CONQUERED" if result.get("conquered") else "repelled"
+                    print(
+                        f"  Turn {turn} | {agent} attacks "
+                        f"{action.from_territory} -> {action.to_territory}: "
+                        f"{result['attack_dice']} vs {result['defend_dice']} = {outcome}"
+                    )
+                    if "eliminated_player" in result:
+                        print(f"  *** Player {result['eliminated_player']} eliminated! ***")
 
     winner = game.get_winner()
     if telemetry is not None:
@@ -0,0 +1,243 @@
+"""Expectimax search over the attack phase, used by ExpectiminimaxAgent."""
+
+import time
+
+from .dice import attack_outcomes
+from .evaluation import board_tables, features_from_arrays
+
+# evaluations are scaled into [LOW, HIGH], which the chance node pruning relies on.
+LOW = 0.0
+HIGH = 1.0
+
+# transposition table entry flags.
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+# Searches the current player's remaining attacks.
+# A state is an (owners, armies) pair of tuples indexed like board.all_territories().
+# Max nodes choose between stopping and one of the possible attacks, and every
+# attack is a chance node over the exact dice outcomes from dice.attack_outcomes.
+# Search deepens one attack at a time until the time, node or depth limit is hit,
+# using the best move of the previous depth to order moves, Star1 bounds to cut
+# chance nodes short, and a transposition table keyed on a hash of the state.
+# Leaves are scored by a built-in heuristic, or by an evaluation.LinearEvaluator /
+# MLPEvaluator when one is given, in which case all leaves below a chance node
+# are scored in one batch.
+class AttackSearch:
+    def __init__(self, game_state, player_id, table, max_depth=4, time_limit=None,
+                 node_limit=None, max_moves=8, table_size=200_000, evaluator=None):
+        self.player_id = player_id
+        self.num_players = game_state.num_players
+        self.table = table
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_moves = max_moves
+        self.table_size = table_size
+        self.evaluator = evaluator
+        self.tables = board_tables(game_state.board) if evaluator is not None else None
+
+        board = game_state.board
+        territories = board.all_territories()
+        self.names = board.map.names
+        self.neighbors = [board.map.neighbors(i) for i in range(len(territories))]
+        members = {}
+        for i, t in enumerate(territories):
+            members.setdefault(t.continent, []).append(i)
+        self.continents = [
+            (tuple(indexes), board.continent_bonuses.get(continent, 0))
+            for continent, indexes in members.items()
+        ]
+        self.total_bonus = sum(bonus for _, bonus in self.continents)
+        self.root = (
+            tuple(t.owner for t in territories),
+            tuple(t.armies for t in territories),
+        )
+
+        self.nodes = 0
+        self.deadline = None
+        self.evaluations = {}
+        self.stats = {}
+
+    def run(self):
+        """Search from the root. Returns the best (from, to) index pair, or None to stop."""
+        start = time.perf_counter()
+        if self.time_limit is not None:
+            self.deadline = start + self.time_limit
+
+        best_move = None
+        best_value = None
+        depth_reached = 0
+        for depth in range(1, self.max_depth + 1):
+            try:
+                value, move = self._max_value(self.root, depth, LOW, HIGH)
+            except _SearchTimeout:
+                break
+            best_value, best_move = value, move
+            depth_reached = depth
+
+        seconds = time.perf_counter() - start
+        self.stats = {
+            "depth": depth_reached,
+            "nodes": self.nodes,
+            "seconds": seconds,
+            "nodes_per_second": self.nodes / seconds if seconds > 0 else 0.0,
+            "value": best_value,
+        }
+        return best_move
+
+    def _tick(self):
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise _SearchTimeout()
+        # checking the clock is not free, so only do it every so often.
+        if self.deadline is not None and self.nodes % 256 == 0 and time.perf_counter() > self.deadline:
+            raise _SearchTimeout()
+
+    def _max_value(self, state, depth, alpha, beta):
+        self._tick()
+        owners, armies = state
+
+        tt_move = None
+        # keys and checks are fixed-size ints rather than the state itself, so
+        # an entry costs the same on any map and table_size bounds the memory.
+        # The check, a second hash of the state, tells colliding states apart.
+        key = hash(state)
+        check = hash((armies, owners))
+        entry = self.table.get(key)
+        if entry is not None and entry[0] == check:
+            _, entry_depth, entry_value, flag, tt_move = entry
+            if entry_depth >= depth:
+                if (flag == EXACT
+                        or (flag == LOWER_BOUND and entry_value >= beta)
+                        or (flag == UPPER_BOUND and entry_value <= alpha)):
+                    return entry_value, tt_move
+
+        # stopping here is always an option.
+        best = self._evaluate(owners, armies)
+        best_move = None
+        if depth == 0:
+            return best, None
+
+        window_alpha = max(alpha, best)
+        for move in self._ordered_moves(owners, armies, tt_move):
+            if window_alpha >= beta:
+                break
+            value = self._chance_value(state, move, depth, window_alpha, beta)
+            if value > best:
+                best, best_move = value, move
+                window_alpha = max(window_alpha, value)
+
+        if best <= alpha:
+            flag = UPPER_BOUND
+        elif best >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        if len(self.table) >= self.table_size:
+            self.table.clear()
+        self.table[key] = (check, depth, best, flag, best_move)
+        return best, best_move
+
+    # Star1: the children not searched yet are bounded by [LOW, HIGH], which
+    # gives each child a narrowed window and lets us stop early once the
+    # expected value can no longer land inside (alpha, beta).
+    def _chance_value(self, state, move, depth, alpha, beta):
+        outcomes = list(self._outcomes(state, move))
+        if depth == 1 and self.evaluator is not None:
+            self._evaluate_batch([child for _, child in outcomes])
+
+        total = 0.0
+        remaining = 1.0
+        for probability, child in outcomes:
+            remaining -= probability
+            child_alpha = (alpha - total - remaining * HIGH) / probability
+            child_beta = (beta - total - remaining * LOW) / probability
+            value, _ = self._max_value(child, depth - 1, max(LOW, child_alpha), min(HIGH, child_beta))
+            total += probability * value
+            if total + remaining * HIGH <= alpha:
+                return total + remaining * HIGH
+            if total + remaining * LOW >= beta:
+                return total + remaining * LOW
+        return total
+
+    # the same rules as GameState._apply_attack, attacking with as many dice as possible.
+    def _outcomes(self, state, move):
+        owners, armies = state
+        src, dst = move
+        attack_dice = min(3, armies[src] - 1)
+        defend_dice = min(2, armies[dst])
+        for probability, attacker_losses, defender_losses in attack_outcomes(attack_dice, defend_dice):
+            child_armies = list(armies)
+            child_armies[src] -= attacker_losses
+            child_armies[dst] -= defender_losses
+            child_owners = owners
+            if child_armies[dst] <= 0:
+                child_owners = list(owners)
+                child_owners[dst] = self.player_id
+                child_owners = tuple(child_owners)
+                child_armies[src] -= attack_dice
+                child_armies[dst] = attack_dice
+            yield probability, (child_owners, tuple(child_armies))
+
+    def _ordered_moves(self, owners, armies, tt_move):
+        player = self.player_id
+        moves = [
+            (src, dst)
+            for src, owner in enumerate(owners)
+            if owner == player and armies[src] >= 2
+            for dst in self.neighbors[src]
+            if owners[dst] != player
+        ]
+        # favorable army ratios first, the previous best move before anything else.
+        moves.sort(key=lambda m: armies[m[0]] / max(1, armies[m[1]]), reverse=True)
+        if tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves[:self.max_moves]
+
+    # Score in [LOW, HIGH] for the searching player: territory share, army share
+    # and share of the continent bonuses held.
+    def _evaluate(self, owners, armies):
+        key = (owners, armies)
+        value = self.evaluations.get(key)
+        if value is not None:
+            return value
+        if self.evaluator is not None:
+            self._evaluate_batch([key])
+            return self.evaluations[key]
+
+        player = self.player_id
+        mine = 0
+        my_armies = 0
+        for owner, count in zip(owners, armies):
+            if owner == player:
+                mine += 1
+                my_armies += count
+        bonus = sum(
+            b for indexes, b in self.continents
+            if all(owners[i] == player for i in indexes)
+        )
+        value = 0.6 * mine / len(owners) + 0.2 * my_armies / max(1, sum(armies))
+        if self.total_bonus:
+            value += 0.2 * bonus / self.total_bonus
+        else:
+            value += 0.2 * mine / len(owners)
+        self.evaluations[key] = value
+        return value
+
+    def _evaluate_batch(self, states):
+        states = [state for state in states if state not in self.evaluations]
+        if not states:
+            return
+        owners = [owners for owners, _ in states]
+        armies = [armies for _, armies in states]
+        features = features_from_arrays(owners, armies, self.player_id, self.num_players, self.tables)
+        for state, value in zip(states, self.evaluator.evaluate(features)):
+            self.evaluations[state] = float(value)
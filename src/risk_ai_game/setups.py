@@ -0,0 +1,169 @@
+"""A library of balanced starting positions, searched for once and reused."""
+
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from .agent import AgentSpec, AggressiveAgent
+from .board import classic_map
+from .game_state import GameState
+from .maps import GameMap
+from .results import play_seed
+from .stats import WinRate
+
+
+def apply_setup(game, owners, armies):
+    """Put a stored setup (owner and army per territory, in map order) on the board."""
+    for t, owner, count in zip(game.board.by_index, owners, armies):
+        t.owner = int(owner)
+        t.armies = int(count)
+    game.invalidate()
+    game.armies_to_deploy = game.get_reinforcements(game.current_player)
+
+
+def random_setup(game_map, num_players, rng):
+    """Deal territories like GameState.setup_random, as (owners, armies) arrays."""
+    order = list(range(len(game_map)))
+    rng.shuffle(order)
+    owners = np.empty(len(game_map), dtype=np.int8)
+    for i, territory in enumerate(order):
+        owners[territory] = i % num_players
+    return owners, np.ones(len(game_map), dtype=np.int16)
+
+
+# Setups grouped by player count, all for one map.
+# Stored as one compressed .npz: the territory names, then for every player
+# count n an "owners_n" and "armies_n" array with one row per setup.
+class SetupLibrary:
+    def __init__(self, territory_names):
+        self.territory_names = list(territory_names)
+        self.owners: dict[int, np.ndarray] = {}
+        self.armies: dict[int, np.ndarray] = {}
+        # the last map checked against territory_names.
+        self._checked_map = None
+
+    @classmethod
+    def for_map(cls, game_map):
+        return cls(game_map.names)
+
+    def count(self, num_players):
+        return len(self.owners.get(num_players, ()))
+
+    def add(self, num_players, owners, armies):
+        owners = np.asarray(owners, dtype=np.int8).reshape(1, -1)
+        armies = np.asarray(armies, dtype=np.int16).reshape(1, -1)
+        if owners.shape[1] != len(self.territory_names):
+            raise ValueError("setup does not match the library's map")
+        if num_players in self.owners:
+            owners = np.concatenate([self.owners[num_players], owners])
+            armies = np.concatenate([self.armies[num_players], armies])
+        self.owners[num_players] = owners
+        self.armies[num_players] = armies
+
+    def save(self, path):
+        arrays = {"territory_names": np.array(self.territory_names)}
+        for n in self.owners:
+            arrays[f"owners_{n}"] = self.owners[n]
+            arrays[f"armies_{n}"] = self.armies[n]
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            library = cls([str(n) for n in data["territory_names"]])
+            for key in data.files:
+                if key.startswith("owners_"):
+                    n = int(key[len("owners_"):])
+                    library.owners[n] = data[key]
+                    library.armies[n] = data[f"armies_{n}"]
+        return library
+
+    def sample(self, game, rng=random):
+        """Put a randomly chosen setup for game's player count on game's board."""
+        if game.board.map is not self._checked_map:
+            if game.board.map.names != self.territory_names:
+                raise ValueError("the library was built for a different map")
+            self._checked_map = game.board.map
+        owners = self.owners.get(game.num_players)
+        if owners is None or len(owners) == 0:
+            raise ValueError(f"no setups for {game.num_players} players")
+        i = rng.randrange(len(owners))
+        apply_setup(game, owners[i], self.armies[game.num_players][i])
+
+    # Use as RiskAIGameOptions.initial_board_setup. Draws from the global
+    # random module, so games stay reproducible with random_seed.
+    def initial_board_setup(self, game: GameState) -> None:
+        self.sample(game)
+
+
+# Play games from one setup and count the wins from each seat.
+def _seat_wins(task):
+    owners, armies, agents, seeds, max_turns, game_map = task
+    wins = [0] * len(agents)
+    for seed in seeds:
+        winner = play_seed(
+            agents, seed, max_turns,
+            initial_board_setup=lambda game: apply_setup(game, owners, armies),
+            game_map=game_map,
+        )["winner"]
+        if winner >= 0:
+            wins[winner] += 1
+    return wins
+
+
+# Deal random setups and keep the ones where identical agents win from every
+# seat about equally often: each seat's Wilson confidence interval (z standard
+# deviations, 95% by default) over games_per_setup games must lie within
+# tolerance of 1 / num_players. The interval shrinks like 1 / sqrt(games), so
+# with the defaults it is about +-0.07 wide; with too few games no setup fits.
+# Candidates are played out in parallel. Accepted setups are added to library
+# (a new one if not given), which is returned; save it and reuse it.
+def generate_balanced_setups(
+    num_players: int,
+    count: int,
+    agent: Optional[AgentSpec] = None,
+    games_per_setup: int = 200,
+    tolerance: float = 0.1,
+    z: float = 1.96,
+    max_turns: int = 500,
+    game_map: Optional[GameMap] = None,
+    library: Optional[SetupLibrary] = None,
+    max_candidates: Optional[int] = None,
+    workers: Optional[int] = None,
+    seed: int = 0,
+) -> SetupLibrary:
+    agent = agent or AgentSpec(AggressiveAgent)
+    agents = [agent] * num_players
+    board_map = game_map if game_map is not None else classic_map()
+    library = library or SetupLibrary.for_map(board_map)
+    rng = random.Random(seed)
+    max_candidates = max_candidates or 50 * count
+    fair = 1.0 / num_players
+
+    accepted = 0
+    tried = 0
+    batch_size = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while accepted < count and tried < max_candidates:
+            batch = []
+            for _ in range(min(batch_size, max_candidates - tried)):
+                owners, armies = random_setup(board_map, num_players, rng)
+                seeds = [rng.randrange(2 ** 31) for _ in range(games_per_setup)]
+                batch.append((owners, armies, agents, seeds, max_turns, game_map))
+            tried += len(batch)
+
+            for task, wins in zip(batch, pool.map(_seat_wins, batch)):
+                record = WinRate(num_players)
+                record.wins = wins
+                record.games = games_per_setup
+                record.ties = games_per_setup - sum(wins)
+                intervals = [record.interval(p, z) for p in range(num_players)]
+                if accepted < count and all(
+                    fair - tolerance <= low and high <= fair + tolerance for low, high in intervals
+                ):
+                    library.add(num_players, task[0], task[1])
+                    accepted += 1
+    return library
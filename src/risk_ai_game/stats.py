@@ -0,0 +1,337 @@
+"""Bounded memory statistics for experiments over many games.
+
+Every aggregator here uses constant or fixed-size memory no matter how many
+games are pushed into it, is picklable, and has a merge() so results from
+worker processes can be combined.
+"""
+
+import math
+import random
+from typing import Any, Optional
+
+from .game_state import GameState
+from .telemetry import GameTelemetry
+
+
+# Mean / variance / min / max of a stream of numbers (Welford's algorithm).
+class RunningStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def push(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def merge(self, other: "RunningStats") -> None:
+        # Chan et al. parallel combination.
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+# Counts of values in fixed-width bins over [low, high).
+# Values outside the range are counted as underflow / overflow.
+class Histogram:
+    def __init__(self, low: float, high: float, bins: int) -> None:
+        if high <= low or bins < 1:
+            raise ValueError("need low < high and at least one bin")
+        self.low = low
+        self.high = high
+        self.counts = [0] * bins
+        self.underflow = 0
+        self.overflow = 0
+
+    @property
+    def bin_width(self) -> float:
+        return (self.high - self.low) / len(self.counts)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts) + self.underflow + self.overflow
+
+    def edges(self) -> list[float]:
+        return [self.low + i * self.bin_width for i in range(len(self.counts) + 1)]
+
+    def push(self, x: float) -> None:
+        if x < self.low:
+            self.underflow += 1
+        elif x >= self.high:
+            self.overflow += 1
+        else:
+            self.counts[int((x - self.low) / self.bin_width)] += 1
+
+    def merge(self, other: "Histogram") -> None:
+        if (other.low, other.high, len(other.counts)) != (self.low, self.high, len(self.counts)):
+            raise ValueError("can only merge histograms with the same bins")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile, interpolated within the bin it falls in."""
+        target = q * self.total
+        seen = self.underflow
+        if target <= seen:
+            return self.low
+        for i, n in enumerate(self.counts):
+            if seen + n >= target and n > 0:
+                return self.low + (i + (target - seen) / n) * self.bin_width
+            seen += n
+        return self.high
+
+
+# A uniform random sample of at most size items from a stream (algorithm R).
+class ReservoirSample:
+    def __init__(self, size: int, seed: Optional[int] = None) -> None:
+        self.size = size
+        self.seen = 0
+        self.items: list = []
+        self._rng = random.Random(seed)
+
+    def push(self, item: Any) -> None:
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+        else:
+            j = self._rng.randrange(self.seen)
+            if j < self.size:
+                self.items[j] = item
+
+    def merge(self, other: "ReservoirSample") -> None:
+        # a smaller sample may hold fewer items than this side would draw from it.
+        if other.size != self.size:
+            raise ValueError("can only merge reservoir samples of the same size")
+        # a uniform sample of the combined stream takes a hypergeometric number
+        # of its items from this side: the number of draws from this side's
+        # self.seen items when drawing without replacement from all seen items.
+        seen = self.seen + other.seen
+        if seen == 0:
+            return
+        draws = min(self.size, seen)
+        mine = 0
+        mine_left, left = self.seen, seen
+        for _ in range(draws):
+            if self._rng.random() * left < mine_left:
+                mine += 1
+                mine_left -= 1
+            left -= 1
+        self.items = (
+            self._rng.sample(self.items, mine)
+            + self._rng.sample(other.items, draws - mine)
+        )
+        self.seen = seen
+
+
+# Wins per seat and ties, with Wilson score confidence intervals.
+class WinRate:
+    def __init__(self, num_players: int) -> None:
+        self.wins = [0] * num_players
+        self.ties = 0
+        self.games = 0
+
+    def push(self, winner: Optional[int]) -> None:
+        self.games += 1
+        if winner is None or winner < 0:
+            self.ties += 1
+        else:
+            self.wins[winner] += 1
+
+    def merge(self, other: "WinRate") -> None:
+        self.wins = [a + b for a, b in zip(self.wins, other.wins)]
+        self.ties += other.ties
+        self.games += other.games
+
+    def rate(self, player: int) -> float:
+        return self.wins[player] / self.games if self.games else 0.0
+
+    def interval(self, player: int, z: float = 1.96) -> tuple[float, float]:
+        """Wilson score interval for player's win rate, 95% by default."""
+        n = self.games
+        if n == 0:
+            return (0.0, 1.0)
+        p = self.wins[player] / n
+        denominator = 1 + z * z / n
+        center = (p + z * z / (2 * n)) / denominator
+        margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+        return (max(0.0, center - margin), min(1.0, center + margin))
+
+
+# Mean territory share of each player over game time, in buckets of
+# bucket_turns turns. Turns past max_turns go in the last bucket.
+class TerritoryShareCurve:
+    def __init__(self, num_players: int, bucket_turns: int = 10, max_turns: int = 500) -> None:
+        self.num_players = num_players
+        self.bucket_turns = bucket_turns
+        buckets = max(1, math.ceil(max_turns / bucket_turns))
+        self.sums = [[0.0] * num_players for _ in range(buckets)]
+        self.counts = [0] * buckets
+
+    def push(self, turn: int, shares: list[float]) -> None:
+        bucket = min(turn // self.bucket_turns, len(self.counts) - 1)
+        row = self.sums[bucket]
+        for p, share in enumerate(shares):
+            row[p] += share
+        self.counts[bucket] += 1
+
+    def merge(self, other: "TerritoryShareCurve") -> None:
+        if len(other.counts) != len(self.counts) or other.bucket_turns != self.bucket_turns:
+            raise ValueError("can only merge curves with the same buckets")
+        for row, other_row in zip(self.sums, other.sums):
+            for p in range(self.num_players):
+                row[p] += other_row[p]
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def curve(self, player: int) -> list[Optional[float]]:
+        """Mean share per bucket, None for buckets no game reached."""
+        return [
+            row[player] / n if n else None
+            for row, n in zip(self.sums, self.counts)
+        ]
+
+
+# How often each player holds each whole continent: at the end of the game,
+# and as a fraction of all observed turns.
+class ContinentHoldRate:
+    def __init__(self, num_players: int) -> None:
+        self.num_players = num_players
+        self.games = 0
+        self.turns = 0
+        # continent -> per player counts
+        self.held_at_end: dict[str, list[int]] = {}
+        self.turns_held: dict[str, list[int]] = {}
+
+    @staticmethod
+    def holders(game_state: GameState) -> dict[str, Optional[int]]:
+        """The player holding each whole continent, or None."""
+        owners: dict[str, set] = {}
+        for t in game_state.board.all_territories():
+            owners.setdefault(t.continent, set()).add(t.owner)
+        return {c: next(iter(o)) if len(o) == 1 else None for c, o in owners.items()}
+
+    def _add(self, table, holders):
+        for continent, holder in holders.items():
+            row = table.setdefault(continent, [0] * self.num_players)
+            if holder is not None:
+                row[holder] += 1
+
+    def push_turn(self, game_state: GameState) -> None:
+        self.turns += 1
+        self._add(self.turns_held, self.holders(game_state))
+
+    def push_game_end(self, game_state: GameState) -> None:
+        self.games += 1
+        self._add(self.held_at_end, self.holders(game_state))
+
+    def merge(self, other: "ContinentHoldRate") -> None:
+        self.games += other.games
+        self.turns += other.turns
+        for mine, theirs in ((self.held_at_end, other.held_at_end), (self.turns_held, other.turns_held)):
+            for continent, row in theirs.items():
+                current = mine.setdefault(continent, [0] * self.num_players)
+                mine[continent] = [a + b for a, b in zip(current, row)]
+
+    def end_rate(self, continent: str, player: int) -> float:
+        return self.held_at_end.get(continent, [0] * self.num_players)[player] / self.games if self.games else 0.0
+
+    def turn_rate(self, continent: str, player: int) -> float:
+        return self.turns_held.get(continent, [0] * self.num_players)[player] / self.turns if self.turns else 0.0
+
+
+# A telemetry object feeding all of the above, meant to be reused for every
+# game of an experiment (pass the same instance to each run_game).
+# Territory shares and continent holders are sampled once per turn.
+# Memory stays the same after 10 games or 10^6; merge() the collectors of
+# several worker processes to combine their results.
+class StreamingStatsCollector(GameTelemetry):
+    def __init__(
+        self,
+        num_players: int,
+        max_turns: int = 500,
+        bucket_turns: int = 10,
+        turn_bins: int = 50,
+        sample_size: int = 1000,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.num_players = num_players
+        self.win_rate = WinRate(num_players)
+        self.turn_stats = RunningStats()
+        self.turn_histogram = Histogram(0, max_turns + 1, turn_bins)
+        self.turn_sample = ReservoirSample(sample_size, seed)
+        self.territory_share = TerritoryShareCurve(num_players, bucket_turns, max_turns)
+        self.continents = ContinentHoldRate(num_players)
+        self._turn = 0
+
+    def _push_turn(self, game_state: GameState, turn: int) -> None:
+        counts = [0] * self.num_players
+        territories = game_state.board.all_territories()
+        for t in territories:
+            if t.owner is not None:
+                counts[t.owner] += 1
+        self.territory_share.push(turn, [c / len(territories) for c in counts])
+        self.continents.push_turn(game_state)
+
+    def on_game_start(self, game_state: GameState) -> None:
+        self._turn = game_state.turn_number
+
+    def on_before_action(self, game_state: GameState) -> None:
+        pass
+
+    def on_action(
+        self,
+        game_state: GameState,
+        action: Any,
+        result: dict,
+    ) -> None:
+        if game_state.turn_number != self._turn:
+            self._push_turn(game_state, self._turn)
+            self._turn = game_state.turn_number
+
+    def on_game_end(self, game_state: GameState, winner: Optional[int]) -> None:
+        # a game that is won ends in the middle of a turn; one stopped at
+        # max_turns ends right after a turn that on_action already recorded.
+        if winner is not None:
+            self._push_turn(game_state, game_state.turn_number)
+        self.win_rate.push(winner)
+        self.turn_stats.push(game_state.turn_number)
+        self.turn_histogram.push(game_state.turn_number)
+        self.turn_sample.push(game_state.turn_number)
+        self.continents.push_game_end(game_state)
+
+    def merge(self, other: "StreamingStatsCollector") -> None:
+        self.win_rate.merge(other.win_rate)
+        self.turn_stats.merge(other.turn_stats)
+        self.turn_histogram.merge(other.turn_histogram)
+        self.turn_sample.merge(other.turn_sample)
+        self.territory_share.merge(other.territory_share)
+        self.continents.merge(other.continents)
+
+    def summary(self) -> dict:
+        return {
+            "games": self.win_rate.games,
+            "win_rates": [self.win_rate.rate(p) for p in range(self.num_players)],
+            "tie_rate": self.win_rate.ties / self.win_rate.games if self.win_rate.games else 0.0,
+            "mean_turns": self.turn_stats.mean,
+            "std_turns": self.turn_stats.std,
+        }
@@ -34,6 +34,41 @@ class GameTelemetry(ABC):
     ) -> None:
         pass
 
+    # A small, JSON serializable summary of what was collected, used when
+    # storing results for many games. Empty unless a collector provides one.
+    def summary(self) -> dict:
+        return {}
+
+# Forwards every call to several telemetry objects, so one game can feed many collectors.
+class MultiTelemetry(GameTelemetry):
+    def __init__(self, collectors: list[GameTelemetry]) -> None:
+        self.collectors = collectors
+
+    def on_game_start(self, game_state: GameState) -> None:
+        for c in self.collectors:
+            c.on_game_start(game_state)
+
+    def on_before_action(self, game_state: GameState) -> None:
+        for c in self.collectors:
+            c.on_before_action(game_state)
+
+    def on_action(
+        self,
+        game_state: GameState,
+        action: Any,
+        result: dict,
+    ) -> None:
+        for c in self.collectors:
+            c.on_action(game_state, action, result)
+
+    def on_game_end(self, game_state: GameState, winner: Optional[int]) -> None:
+        for c in self.collectors:
+            c.on_game_end(game_state, winner)
+
+    # summaries keyed by collector class name.
+    def summary(self) -> dict:
+        return {type(c).__name__: c.summary() for c in self.collectors}
+
 # A simple telemetry object example.
 # Count the number of turns in a game.
 class TurnCountCollector(GameTelemetry):
@@ -57,6 +92,9 @@ class TurnCountCollector(GameTelemetry):
     def on_game_end(self, game_state: GameState, winner: Optional[int]) -> None:
         self.turns = game_state.turn_number
 
+    def summary(self) -> dict:
+        return {"turns": self.turns}
+
 # A simple telemetry object that counts how many territories each player has at the end of each turn.
 class TerritoryCountCollector(GameTelemetry):
     def __init__(self) -> None:
@@ -87,6 +125,16 @@ class TerritoryCountCollector(GameTelemetry):
     def on_game_end(self, game_state: GameState, winner: Optional[int]) -> None:
         pass
 
+    # only the last snapshot, the full list is too big to keep for many games.
+    def summary(self) -> dict:
+        if not self.snapshots:
+            return {}
+        last = self.snapshots[-1]
+        return {
+            "steps": len(self.snapshots),
+            "final_territories": [v for k, v in last.items() if isinstance(k, int)],
+        }
+
 # A telemetry object that captures the initial and final game states.
 # This could easily be expanded to capture all states.
 class GameInitialFinalStates(GameTelemetry):
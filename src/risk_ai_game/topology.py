@@ -0,0 +1,148 @@
+"""Static graph facts about a map, computed once per process and map."""
+
+from functools import lru_cache
+
+import numpy as np
+
+# hop count for territories that cannot reach each other.
+UNREACHABLE = np.iinfo(np.uint16).max
+
+
+# Everything here depends only on the map, never on who owns what, so it is
+# computed once per map (see map_topology) and shared by every game on it.
+# The all-pairs distance matrix is territories^2 in size and is only built the
+# first time it is used.
+class MapTopology:
+    def __init__(self, game_map):
+        self.map = game_map
+        size = len(game_map)
+        self.degrees = np.diff(np.asarray(game_map.indptr, dtype=np.int64)).astype(np.int32)
+
+        # territories of each continent that touch another continent (border),
+        # and the outside territories touching it (entries, where attacks come from).
+        self.continent_borders = {c: [] for c in game_map.continent_sizes}
+        self.continent_entries = {c: [] for c in game_map.continent_sizes}
+        entries = {c: set() for c in game_map.continent_sizes}
+        for i in range(size):
+            continent = game_map.continents[i]
+            outside = [j for j in game_map.neighbors(i) if game_map.continents[j] != continent]
+            if outside:
+                self.continent_borders[continent].append(i)
+            for j in outside:
+                entries[game_map.continents[j]].add(i)
+        for continent, indexes in entries.items():
+            self.continent_entries[continent] = sorted(indexes)
+
+        self.articulation_points = _articulation_points(game_map)
+        self._distances = None
+
+    @property
+    def distances(self):
+        """(territories, territories) uint16 matrix of shortest hop counts."""
+        if self._distances is None:
+            self._distances = _all_pairs_hops(self.map)
+        return self._distances
+
+
+@lru_cache(maxsize=16)
+def map_topology(game_map):
+    return MapTopology(game_map)
+
+
+# BFS from every territory at once. Each territory keeps a bitmask (a Python
+# int) of the sources that have reached it, so one sweep over the edges per
+# hop advances all searches together.
+def _all_pairs_hops(game_map):
+    size = len(game_map)
+    num_bytes = (size + 7) // 8
+    neighbors = [game_map.neighbors(i) for i in range(size)]
+    distances = np.full((size, size), UNREACHABLE, dtype=np.uint16)
+    np.fill_diagonal(distances, 0)
+
+    visited = [1 << i for i in range(size)]
+    frontier = list(visited)
+    hops = 0
+    while any(frontier):
+        hops += 1
+        next_frontier = [0] * size
+        for v in range(size):
+            reached = 0
+            for u in neighbors[v]:
+                reached |= frontier[u]
+            reached &= ~visited[v]
+            if reached:
+                visited[v] |= reached
+                next_frontier[v] = reached
+        # unpack every territory's newly reached sources in one go.
+        packed = b"".join(m.to_bytes(num_bytes, "little") for m in next_frontier)
+        bits = np.unpackbits(
+            np.frombuffer(packed, dtype=np.uint8).reshape(size, num_bytes),
+            axis=1,
+            bitorder="little",
+        )[:, :size]
+        distances[bits.astype(bool)] = hops
+        frontier = next_frontier
+    return distances
+
+
+# Territories whose loss splits the map in two (Tarjan's low-link algorithm,
+# iterative so large maps don't hit the recursion limit).
+def _articulation_points(game_map):
+    size = len(game_map)
+    order = [-1] * size
+    low = [0] * size
+    points = set()
+    counter = 0
+    for root in range(size):
+        if order[root] != -1:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        root_children = 0
+        # (node, parent, iterator over its neighbors)
+        stack = [(root, -1, iter(game_map.neighbors(root)))]
+        while stack:
+            node, parent, it = stack[-1]
+            child = next(it, None)
+            if child is None:
+                stack.pop()
+                if parent != -1:
+                    low[parent] = min(low[parent], low[node])
+                    if parent != root and low[node] >= order[parent]:
+                        points.add(parent)
+                continue
+            if child == parent:
+                continue
+            if order[child] == -1:
+                order[child] = low[child] = counter
+                counter += 1
+                if node == root:
+                    root_children += 1
+                stack.append((child, node, iter(game_map.neighbors(child))))
+            else:
+                low[node] = min(low[node], order[child])
+        if root_children > 1:
+            points.add(root)
+    return frozenset(points)
+
+
+def distances_from(game_map, sources):
+    """Hops from the nearest of sources (territory indices) to every territory.
+
+    Multi-source BFS; unreachable territories get UNREACHABLE.
+    """
+    distances = [UNREACHABLE] * len(game_map)
+    frontier = list(sources)
+    for i in frontier:
+        distances[i] = 0
+    hops = 0
+    while frontier:
+        hops += 1
+        next_frontier = []
+        for u in frontier:
+            for v in game_map.neighbors(u):
+                if distances[v] == UNREACHABLE:
+                    distances[v] = hops
+                    next_frontier.append(v)
+        frontier = next_frontier
+    return np.array(distances, dtype=np.uint16)
@@ -0,0 +1,266 @@
+"""Tune agent parameters by playing games in parallel."""
+
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from .agent import AgentSpec, AggressiveAgent, ExpectiminimaxAgent, RandomAgent
+from .fingerprint import fingerprint_hash
+from .maps import GameMap
+from .results import _atomic_write, play_seed
+
+
+# One tunable constructor parameter and the range to search it in.
+@dataclass
+class Parameter:
+    name: str
+    low: float
+    high: float
+    integer: bool = False
+
+
+# The parameters worth tuning for the built-in agents.
+DEFAULT_SEARCH_SPACES = {
+    RandomAgent: [Parameter("aggression", 0.0, 1.0)],
+    AggressiveAgent: [Parameter("min_attack_ratio", 0.5, 4.0)],
+    ExpectiminimaxAgent: [
+        Parameter("max_depth", 1, 6, integer=True),
+        Parameter("max_moves", 2, 16, integer=True),
+    ],
+}
+
+# Constructor parameters the Tuner fixes unless told otherwise. Searches are
+# limited by nodes, not time, so a game's result depends only on its seed.
+DEFAULT_FIXED_PARAMS = {
+    ExpectiminimaxAgent: {"time_limit": None, "node_limit": 2000},
+}
+
+
+def _check_reproducible(spec):
+    if getattr(spec.build(0), "time_limit", None) is not None:
+        raise ValueError(
+            f"{spec.agent_class.__name__} has a time_limit, so its games depend on "
+            "machine load; set time_limit=None and limit it by nodes instead"
+        )
+
+
+# Maps points of the unit cube onto agent parameters, so the search itself
+# never has to care about parameter ranges or types.
+class SearchSpace:
+    def __init__(self, parameters):
+        if not parameters:
+            raise ValueError("parameters must be a non-empty list")
+        self.parameters = list(parameters)
+
+    @classmethod
+    def for_agent(cls, agent_class):
+        return cls(DEFAULT_SEARCH_SPACES[agent_class])
+
+    def __len__(self):
+        return len(self.parameters)
+
+    def to_params(self, point):
+        params = {}
+        for p, x in zip(self.parameters, point):
+            value = p.low + min(1.0, max(0.0, x)) * (p.high - p.low)
+            params[p.name] = int(round(value)) if p.integer else value
+        return params
+
+
+# Play one seed twice, once in each seat, and score it for the candidate:
+# 1 per win, 0.5 per tie.
+def _play_seed(task):
+    candidate, opponent, seed, max_turns, game_map = task
+    score = 0.0
+    for seat in (0, 1):
+        agents = [opponent, opponent]
+        agents[seat] = candidate
+        winner = play_seed(agents, seed, max_turns, game_map=game_map)["winner"]
+        if winner == seat:
+            score += 1.0
+        elif winner == -1:
+            score += 0.5
+    return score / 2
+
+
+# Evolution strategy over a SearchSpace, in the style of a diagonal CMA-ES:
+# each generation samples a population around a mean, plays every candidate
+# against the opponent on the same seeds (common random numbers, so candidates
+# are compared on identical dice and deals rather than on luck), then moves the
+# mean towards the best half and adapts the per-parameter step sizes.
+#
+# The result is the final mean: the best candidate of a generation is only the
+# luckiest of several noisy scores, and scores from different generations were
+# played on different seeds, so neither is a fair pick on its own.
+#
+# Games are spread over a process pool. With checkpoint_path set, the state is
+# saved after every generation and a new Tuner with the same path picks up
+# where the last one stopped; it raises ValueError if the checkpoint was made
+# with other settings. generations may differ, to extend a finished run. Agents must not be limited by time (see
+# DEFAULT_FIXED_PARAMS), or neither the seed comparison nor resuming holds.
+class Tuner:
+    def __init__(
+        self,
+        # the agent class to tune.
+        agent_class: type,
+        # the agent every candidate plays against.
+        opponent: AgentSpec,
+        # defaults to DEFAULT_SEARCH_SPACES for agent_class.
+        space: Optional[SearchSpace] = None,
+        # constructor parameters that are not tuned, on top of DEFAULT_FIXED_PARAMS.
+        fixed_params: Optional[dict] = None,
+        population: int = 8,
+        generations: int = 10,
+        # seeds per candidate per generation, each played from both seats.
+        games_per_candidate: int = 20,
+        # initial step size, in unit cube coordinates.
+        sigma: float = 0.3,
+        max_turns: int = 500,
+        # None for the classic map.
+        game_map: Optional[GameMap] = None,
+        # worker processes, None for one per CPU.
+        workers: Optional[int] = None,
+        seed: int = 0,
+        checkpoint_path: Optional[str] = None,
+    ):
+        if population < 2:
+            raise ValueError("population must be at least 2")
+        self.agent_class = agent_class
+        self.opponent = opponent
+        self.space = space or SearchSpace.for_agent(agent_class)
+        self.fixed_params = {**DEFAULT_FIXED_PARAMS.get(agent_class, {}), **(fixed_params or {})}
+        self.population = population
+        self.generations = generations
+        self.games_per_candidate = games_per_candidate
+        self.max_turns = max_turns
+        self.game_map = game_map
+        self.workers = workers
+        self.seed = seed
+        self.checkpoint_path = checkpoint_path
+
+        self.generation = 0
+        self.mean = [0.5] * len(self.space)
+        self.sigmas = [sigma] * len(self.space)
+        self.history = []
+
+        _check_reproducible(self.spec(self.params))
+        _check_reproducible(opponent)
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self._load_checkpoint()
+
+    def spec(self, params):
+        return AgentSpec(self.agent_class, {**self.fixed_params, **params})
+
+    @property
+    def params(self):
+        """The tuned parameters so far: the search mean."""
+        return self.space.to_params(self.mean)
+
+    def run(self):
+        """Run the remaining generations. Returns the tuned parameters."""
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while self.generation < self.generations:
+                self._step(pool)
+                if self.checkpoint_path is not None:
+                    self._save_checkpoint()
+        return self.params
+
+    def _step(self, pool):
+        # everything random in a generation derives from (seed, generation),
+        # so a resumed run samples exactly what the original would have.
+        rng = random.Random(f"{self.seed}:{self.generation}")
+        seeds = [rng.randrange(2 ** 31) for _ in range(self.games_per_candidate)]
+
+        points = []
+        for _ in range(self.population):
+            z = [rng.gauss(0.0, 1.0) for _ in self.mean]
+            points.append([
+                min(1.0, max(0.0, m + s * zi))
+                for m, s, zi in zip(self.mean, self.sigmas, z)
+            ])
+
+        candidates = [self.spec(self.space.to_params(x)) for x in points]
+        tasks = [
+            (candidate, self.opponent, seed, self.max_turns, self.game_map)
+            for candidate in candidates
+            for seed in seeds
+        ]
+        results = list(pool.map(_play_seed, tasks, chunksize=max(1, len(seeds) // 4)))
+        scores = [
+            sum(results[i * len(seeds):(i + 1) * len(seeds)]) / len(seeds)
+            for i in range(len(candidates))
+        ]
+
+        ranked = sorted(range(len(points)), key=lambda i: scores[i], reverse=True)
+        mu = len(points) // 2
+        weights = [math.log(mu + 0.5) - math.log(rank + 1) for rank in range(mu)]
+        total = sum(weights)
+        weights = [w / total for w in weights]
+        elite = [points[i] for i in ranked[:mu]]
+
+        old_mean = self.mean
+        self.mean = [
+            sum(w * x[d] for w, x in zip(weights, elite))
+            for d in range(len(old_mean))
+        ]
+        # rank-mu style update of the per-parameter variances.
+        learning_rate = 0.3
+        self.sigmas = [
+            max(0.02, math.sqrt(
+                (1 - learning_rate) * s * s
+                + learning_rate * sum(w * (x[d] - old_mean[d]) ** 2 for w, x in zip(weights, elite))
+            ))
+            for d, s in enumerate(self.sigmas)
+        ]
+
+        self.history.append({
+            "generation": self.generation,
+            "scores": scores,
+            "params": [c.params for c in candidates],
+            "mean_params": self.params,
+        })
+        self.generation += 1
+
+    def _config(self):
+        # everything a checkpoint's state depends on, as it is stored.
+        config = {
+            "agent_class": AgentSpec(self.agent_class).to_dict()["class"],
+            "fixed_params": self.fixed_params,
+            "opponent": self.opponent.to_dict(),
+            "space": [asdict(p) for p in self.space.parameters],
+            "seed": self.seed,
+            "population": self.population,
+            "games_per_candidate": self.games_per_candidate,
+            "max_turns": self.max_turns,
+            "game_map": None if self.game_map is None else fingerprint_hash(self.game_map.to_dict()),
+        }
+        return json.loads(json.dumps(config, default=repr))
+
+    def _save_checkpoint(self):
+        state = {
+            "config": self._config(),
+            "generation": self.generation,
+            "mean": self.mean,
+            "sigmas": self.sigmas,
+            "history": self.history,
+        }
+        _atomic_write(self.checkpoint_path, lambda f: f.write(json.dumps(state).encode()))
+
+    def _load_checkpoint(self):
+        with open(self.checkpoint_path) as f:
+            state = json.load(f)
+        stored, config = state.get("config", {}), self._config()
+        changed = sorted(k for k in config if stored.get(k) != config[k])
+        if changed:
+            raise ValueError(
+                f"checkpoint {self.checkpoint_path!r} was made with other settings: "
+                + ", ".join(f"{k} was {stored.get(k)!r}, not {config[k]!r}" for k in changed)
+            )
+        self.generation = state["generation"]
+        self.mean = state["mean"]
+        self.sigmas = state["sigmas"]
+        self.history = state["history"]